@@ -79,6 +79,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so the scheduler's
+            # conflict check and its writes cannot interleave with another writer
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -120,6 +126,20 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# File based so every worker process sees the same week versions
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -135,3 +155,18 @@ INSTALLED_APPS = [
     'scheduler', 
 ]
 
+# Scheduler
+# Place jobs added or edited with "unspecific time" right away, touching only
+# the days the scheduler has to look at, instead of waiting for "Schedule All"
+SCHEDULER_AUTO_PLACE = True
+# Seconds "Schedule All" may spend per chunk improving on the greedy plan
+# (fewer unplaced hours, fewer unusable gaps); 0 keeps the greedy plan
+SCHEDULER_OPTIMIZE_SECONDS = 0.5
+# Processes planning the working calendars of a scheduling run side by side;
+# 1 plans them one after the other. "Schedule All" runs inside every web
+# process, which would each keep a pool of their own, so only the
+# schedule_backlog command plans in parallel by default (see its --workers)
+SCHEDULER_WORKERS = 1
+# Seconds between checks of the today page's live updates for jobs changed
+# in other processes or becoming overdue; writes in the same process are pushed at once
+SCHEDULER_LIVE_INTERVAL = 10
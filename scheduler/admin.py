@@ -1,3 +1,39 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BlockedPeriod, Holiday, RecurrenceException, RecurringJob, WorkingCalendar, WorkingDay
+
+
+class WorkingDayInline(admin.TabularInline):
+    model = WorkingDay
+    extra = 0
+
+
+class BlockedPeriodInline(admin.TabularInline):
+    model = BlockedPeriod
+    extra = 0
+
+
+class HolidayInline(admin.TabularInline):
+    model = Holiday
+    extra = 0
+
+
+@admin.register(WorkingCalendar)
+class WorkingCalendarAdmin(admin.ModelAdmin):
+    # The scheduler plans against the default calendar (see calendars.py)
+    list_display = ['name', 'horizon_days', 'is_default']
+    inlines = [WorkingDayInline, BlockedPeriodInline, HolidayInline]
+
+
+class RecurrenceExceptionInline(admin.TabularInline):
+    # Written by moving, completing or skipping occurrences in the views
+    model = RecurrenceException
+    extra = 0
+    raw_id_fields = ['job']
+
+
+@admin.register(RecurringJob)
+class RecurringJobAdmin(admin.ModelAdmin):
+    list_display = ['title', 'calendar', 'frequency', 'interval', 'weekdays', 'start_time', 'end_time', 'starts_on', 'ends_on']
+    list_filter = ['calendar', 'frequency']
+    inlines = [RecurrenceExceptionInline]
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SchedulerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scheduler'
+
+    def ready(self):
+        # Connect the cache invalidation receivers, then the live feed's
+        # (which must run after the week versions are bumped)
+        from . import cache, calendars, live  # noqa: F401
@@ -0,0 +1,244 @@
+"""Benchmarks of the scheduler and the views on synthetic data.
+
+generate_backlog() fills a database with working calendars booked to a
+given occupancy and a backlog of N jobs; run_benchmarks() times scheduling and
+every read view against it, size after size, and counts their queries.
+Both write to whatever database is connected, so the benchmark command runs
+them in a throwaway test database.
+"""
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .calendars import calendar_config
+from .engine import HOUR, Task, busy_intervals, get_available_time_slots, is_time_available, plan_schedule
+from .models import BlockedPeriod, Job, WorkingCalendar, WorkingDay
+from .scheduling import load_busy_intervals, schedule_backlog
+
+
+DURATIONS = ['0.25', '0.5', '1', '1.5', '2', '3', '4']
+FIXED_LENGTHS = [HOUR // 2, HOUR, 3 * HOUR // 2, 2 * HOUR]  # Jobs already on the calendar
+FROG_SHARE = 0.1
+DIVISIBLE_SHARE = 0.2
+DUE_DATE_SHARE = 0.3
+
+
+def time_of(value):
+    return (datetime.min + timedelta(seconds=value)).time()
+
+
+def benchmark_calendars(count):
+    """Return `count` working calendars: the default one and copies of its hours.
+
+    Copies left over from an earlier call are reused, and removed beyond
+    `count`, which only works once their jobs are gone.
+    """
+    default = WorkingCalendar.objects.get(is_default=True)
+    copies = list(WorkingCalendar.objects.filter(name__startswith='Benchmark ').order_by('id'))
+    for calendar in copies[count - 1:]:
+        calendar.delete()
+    calendars = [default, *copies[:count - 1]]
+    while len(calendars) < count:
+        calendar = WorkingCalendar.objects.create(name=f'Benchmark {len(calendars)}', horizon_days=default.horizon_days)
+        WorkingDay.objects.bulk_create(
+            WorkingDay(calendar=calendar, weekday=day.weekday, start_time=day.start_time, end_time=day.end_time)
+            for day in default.days.all()
+        )
+        BlockedPeriod.objects.bulk_create(
+            BlockedPeriod(calendar=calendar, weekday=period.weekday, start_time=period.start_time, end_time=period.end_time)
+            for period in default.blocked_periods.all()
+        )
+        calendars.append(calendar)
+    return calendars
+
+
+def generate_backlog(size, occupancy=0.5, seed=0, now=None, calendars=1):
+    """Replace every job with synthetic calendars and a backlog.
+
+    The jobs are spread over `calendars` working calendars with the hours
+    of the default one (see benchmark_calendars). Each working day of the
+    horizon of each calendar is walked in blocks of 30 minutes to 2 hours,
+    and each block is booked with probability `occupancy`. Then `size`
+    unscheduled jobs are added: ABC classes from random urgency and
+    importance, FROG_SHARE frogs, DIVISIBLE_SHARE divisible jobs and
+    DUE_DATE_SHARE with a due date in the horizon. Returns the number of
+    jobs booked on the calendars.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    Job.objects.all().delete()
+    calendars = benchmark_calendars(calendars)
+    config = calendar_config()
+
+    fixed = []
+    for calendar in calendars:
+        for offset in range(config.horizon_days):
+            day = now.date() + timedelta(days=offset)
+            frog_day = rng.random() < FROG_SHARE
+            for slot_start, slot_end in get_available_time_slots(day, (), config):
+                cursor = slot_start
+                while cursor < slot_end:
+                    end = min(cursor + rng.choice(FIXED_LENGTHS), slot_end)
+                    if rng.random() < occupancy:
+                        fixed.append(Job(
+                            calendar=calendar,
+                            title=f"Booked {len(fixed)}",
+                            date=day,
+                            start_time=time_of(cursor),
+                            end_time=time_of(end),
+                            duration_hours=Decimal(end - cursor) / HOUR,
+                            is_frog=frog_day,
+                        ))
+                        frog_day = False
+                    cursor = end
+    Job.objects.bulk_create(fixed, batch_size=1000)
+
+    Job.objects.bulk_create(
+        (
+            Job(
+                calendar=rng.choice(calendars),
+                title=f"Job {i:06d}",
+                duration_hours=Decimal(rng.choice(DURATIONS)),
+                urgency=rng.randint(1, 3),
+                importance=rng.randint(1, 3),
+                is_frog=rng.random() < FROG_SHARE,
+                can_be_divided=rng.random() < DIVISIBLE_SHARE,
+                due_date=(
+                    now.date() + timedelta(days=rng.randrange(config.horizon_days))
+                    if rng.random() < DUE_DATE_SHARE else None
+                ),
+            )
+            for i in range(size)
+        ),
+        batch_size=1000,
+    )
+    return len(fixed)
+
+
+@dataclass
+class Measurement:
+    name: str
+    size: int
+    occupancy: float
+    seconds: list
+    queries: int
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'size': self.size,
+            'occupancy': self.occupancy,
+            'runs': len(self.seconds),
+            'min': min(self.seconds),
+            'median': statistics.median(self.seconds),
+            'max': max(self.seconds),
+            'queries': self.queries,
+        }
+
+
+def measure(name, size, occupancy, run, repeat=1):
+    # Wall time of each of `repeat` calls and the queries of the last one
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+    return Measurement(name, size, occupancy, timings, len(queries))
+
+
+def view_requests(client):
+    # The read pages and APIs, as a browser asks for them. The JSON API is
+    # also asked again with the ETag of its last response, as a client
+    # polling an unchanged calendar does, which must come back 304
+    etags = {}
+
+    def get(path, status=200, conditional=False):
+        def run():
+            headers = {'if-none-match': etags[path]} if conditional else {}
+            response = client.get(path, headers=headers)
+            if response.status_code != status:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+            if response.streaming:
+                b''.join(response.streaming_content)  # Exports are only produced while read
+            if 'ETag' in response:
+                etags[path] = response['ETag']
+        return run
+
+    today = datetime.now().date()
+    # A day with jobs on it (generate_backlog books the days from today on)
+    day = Job.objects.filter(date__gte=today).order_by('date').values_list('date', flat=True).first() or today
+    api_paths = {
+        'api:jobs': reverse('api_jobs'),
+        'api:week': reverse('api_week', args=[day.isoformat()]),
+        'api:day': reverse('api_day', args=[day.isoformat()]),
+    }
+
+    requests = {
+        'view:job_list': get(reverse('job_list')),
+        'view:job_list_by_priority': get(reverse('job_list') + '?sort=priority'),
+        'view:export_csv': get(reverse('export_jobs')),
+        'view:weekly_plan_view': get(reverse('weekly_plan_view')),
+        'view:today': get(reverse('today')),
+        'view:next_slot': get(reverse('next_slot') + '?duration=2&count=3'),
+        'view:plan_preview': get(reverse('plan_preview')),
+    }
+    # Dicts keep their order: each API is asked unconditionally first, which records its ETag
+    for name, path in api_paths.items():
+        requests[name] = get(path)
+    for name, path in api_paths.items():
+        requests[f'{name}:not_modified'] = get(path, 304, conditional=True)
+    return requests
+
+
+def run_benchmarks(sizes, occupancy=0.5, seed=0, repeat=5, calendars=1, progress=None):
+    """Time scheduling and the views at every backlog size; returns Measurements.
+
+    Per size: the views on a fresh backlog (the first call separately, as it
+    fills the caches), get_available_time_slots over every booked day, the
+    engine alone on the loaded calendar, and finally schedule_backlog, which
+    commits and so runs once. The engine and get_available_time_slots are
+    timed on the default calendar; schedule_backlog plans all `calendars`.
+    """
+    client = Client()
+    results = []
+
+    def record(measurement):
+        results.append(measurement)
+        if progress is not None:
+            progress(measurement)
+
+    for size in sizes:
+        generate_backlog(size, occupancy, seed, calendars=calendars)
+        config = calendar_config()
+        default_jobs = Job.objects.filter(calendar__is_default=True)
+
+        for name, run in view_requests(client).items():
+            record(measure(f'{name}:cold', size, occupancy, run))
+            record(measure(name, size, occupancy, run, repeat))
+
+        now = datetime.now()
+        busy, frog_days = load_busy_intervals(default_jobs.filter(date__gte=now.date()))
+
+        def available_slots():
+            for day, intervals in busy.items():
+                if is_time_available(day, config):
+                    get_available_time_slots(day, busy_intervals(intervals), config)
+
+        record(measure('get_available_time_slots', size, occupancy, available_slots, repeat))
+
+        tasks = [Task.from_job(job) for job in default_jobs.backlog().defer('description')]
+        record(measure(
+            'plan_schedule', size, occupancy, lambda: plan_schedule(tasks, busy, now, config, frog_days), repeat
+        ))
+
+        record(measure('schedule_backlog', size, occupancy, schedule_backlog))
+    return results
@@ -0,0 +1,146 @@
+"""Cached week queries.
+
+Each ISO week has a version token in the cache, replaced whenever a job on
+one of its days is written (see models.jobs_changed). Cached query results
+are keyed by week and version, so a write never has to find and delete
+them: the next read simply misses and fills the new key. Recurring jobs
+occur in any number of weeks, so they have a single token of their own
+that is part of every week's keys. So does the unscheduled backlog.
+"""
+import time as clock
+import uuid
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Job, RecurrenceException, RecurringJob, jobs_changed
+from .recurrence import aoccurrences
+from .scheduling import add_recurring_busy, load_busy_intervals
+
+
+WEEK_VERSION_KEY = 'scheduler:week-version:{week}'
+RECURRENCE_VERSION_KEY = 'scheduler:recurrence-version'
+BACKLOG_VERSION_KEY = 'scheduler:backlog-version'
+WEEK_JOBS_KEY = 'scheduler:week-jobs:{week}:{version}:{recurrence}'
+WEEK_BUSY_KEY = 'scheduler:week-busy:{calendar}:{week}:{version}:{recurrence}'
+PLAN_PREVIEW_KEY = 'scheduler:plan-preview:{token}'
+
+
+def iso_week(day):
+    year, week, _ = day.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def _new_version():
+    # Unique across processes, unlike a counter incremented with get/set
+    return format(clock.time_ns(), 'x')
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aweek_versions(day):
+    # Version tokens of the week of `day` and of the recurring jobs, read in
+    # one cache call: together they change whenever that week's jobs do
+    keys = [WEEK_VERSION_KEY.format(week=iso_week(day)), RECURRENCE_VERSION_KEY]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _new_version(), None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def week_version(day):
+    return _version(WEEK_VERSION_KEY.format(week=iso_week(day)))
+
+
+def recurrence_version():
+    return _version(RECURRENCE_VERSION_KEY)
+
+
+def backlog_version():
+    return _version(BACKLOG_VERSION_KEY)
+
+
+def bump_week_versions(days):
+    # None among the days stands for the backlog
+    weeks = {iso_week(day) for day in days if day is not None}
+    versions = {WEEK_VERSION_KEY.format(week=week): _new_version() for week in weeks}
+    if None in days:
+        versions[BACKLOG_VERSION_KEY] = _new_version()
+    cache.set_many(versions, None)
+
+
+def by_date_and_start(job):
+    # Order of jobs and occurrences in a week; unscheduled start times go first
+    return (job.date, job.start_time or time.min)
+
+
+async def aweek_jobs(start_of_week, end_of_week):
+    # Jobs and recurring job occurrences of the week ordered by date and
+    # start time, from the cache when it is current
+    version, recurrence = await aweek_versions(start_of_week)
+    key = WEEK_JOBS_KEY.format(week=iso_week(start_of_week), version=version, recurrence=recurrence)
+    jobs = await cache.aget(key)
+    if jobs is None:
+        jobs = [job async for job in Job.objects.filter(date__range=[start_of_week, end_of_week])]
+        jobs += [occurrence async for occurrence in aoccurrences(start_of_week, end_of_week)]
+        jobs.sort(key=by_date_and_start)
+        await cache.aset(key, jobs, getattr(settings, 'SCHEDULER_WEEK_CACHE_TIMEOUT', 7 * 24 * 3600))
+    return jobs
+
+
+def week_busy(day, calendar_id):
+    # Busy calendar and frog days of a working calendar in the week of `day`
+    # (see scheduling.load_busy_intervals), from the cache when it is current
+    key = WEEK_BUSY_KEY.format(
+        calendar=calendar_id, week=iso_week(day), version=week_version(day), recurrence=recurrence_version(),
+    )
+    busy = cache.get(key)
+    if busy is None:
+        start_of_week = day - timedelta(days=day.weekday())
+        end_of_week = start_of_week + timedelta(days=6)
+        busy = load_busy_intervals(Job.objects.filter(calendar_id=calendar_id, date__range=[start_of_week, end_of_week]))
+        add_recurring_busy(*busy, calendar_id, start_of_week, end_of_week)
+        cache.set(key, busy, getattr(settings, 'SCHEDULER_WEEK_CACHE_TIMEOUT', 7 * 24 * 3600))
+    return busy
+
+
+def save_plan_preview(preview):
+    # Keep a previewed plan until it is applied; returns the token to apply it with
+    token = uuid.uuid4().hex
+    cache.set(PLAN_PREVIEW_KEY.format(token=token), preview, getattr(settings, 'SCHEDULER_PREVIEW_TIMEOUT', 3600))
+    return token
+
+
+def pop_plan_preview(token):
+    # The previewed plan, or None once it was applied or has expired
+    key = PLAN_PREVIEW_KEY.format(token=token)
+    preview = cache.get(key)
+    cache.delete(key)
+    return preview
+
+
+@receiver(jobs_changed)
+def invalidate_weeks(sender, dates, **kwargs):
+    # Bump after commit so a reader cannot cache rows the write is about to replace
+    dates = set(dates)
+    transaction.on_commit(lambda: bump_week_versions(dates))
+
+
+@receiver(post_save, sender=RecurringJob)
+@receiver(post_delete, sender=RecurringJob)
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_delete, sender=RecurrenceException)
+def invalidate_recurrence(sender, **kwargs):
+    transaction.on_commit(lambda: cache.set(RECURRENCE_VERSION_KEY, _new_version(), None))
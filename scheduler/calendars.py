@@ -0,0 +1,57 @@
+"""Working calendars the scheduler plans against.
+
+Each WorkingCalendar is compiled into an engine CalendarConfig, with its
+per-weekday free slot templates, once and kept in the cache. Like the
+week caches (see cache.py), the compiled config is keyed by a version token
+that is replaced whenever a calendar, its hours, blocked periods or
+holidays are written, so the next read compiles it again.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .engine import CalendarConfig
+from .models import BlockedPeriod, Holiday, WorkingCalendar, WorkingDay
+
+
+CALENDAR_VERSION_KEY = 'scheduler:calendar-version'
+CALENDAR_CONFIG_KEY = 'scheduler:calendar-config:{calendar}:{version}'
+
+
+def calendar_version():
+    version = cache.get(CALENDAR_VERSION_KEY)
+    if version is None:
+        cache.add(CALENDAR_VERSION_KEY, format(time.time_ns(), 'x'), None)
+        version = cache.get(CALENDAR_VERSION_KEY)
+    return version
+
+
+def calendar_config(calendar_id=None):
+    # Compiled calendar, the default one without an id; the engine's
+    # built-in hours when there is no such calendar
+    key = CALENDAR_CONFIG_KEY.format(calendar=calendar_id or 'default', version=calendar_version())
+    config = cache.get(key)
+    if config is None:
+        calendars = WorkingCalendar.objects.prefetch_related('days', 'blocked_periods', 'holidays')
+        if calendar_id is None:
+            calendar = calendars.filter(is_default=True).first()
+        else:
+            calendar = calendars.filter(id=calendar_id).first()
+        config = calendar.as_config() if calendar is not None else CalendarConfig()
+        cache.set(key, config, None)
+    return config
+
+
+@receiver(post_save, sender=WorkingCalendar)
+@receiver(post_delete, sender=WorkingCalendar)
+@receiver(post_save, sender=WorkingDay)
+@receiver(post_delete, sender=WorkingDay)
+@receiver(post_save, sender=BlockedPeriod)
+@receiver(post_delete, sender=BlockedPeriod)
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def invalidate_calendar(sender, **kwargs):
+    transaction.on_commit(lambda: cache.set(CALENDAR_VERSION_KEY, format(time.time_ns(), 'x'), None))
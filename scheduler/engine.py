@@ -0,0 +1,541 @@
+"""Scheduling engine.
+
+Places tasks into a working calendar without touching the database, so it
+can be profiled, benchmarked and run outside a request. Callers hand in
+plain task records and the busy intervals already on the calendar, and get
+back a Plan describing where each task goes.
+
+Inside the engine, times of day and durations are integer seconds (see
+seconds()), so the placement loop does no Decimal, datetime or timedelta
+arithmetic; datetimes are only built for the placements it returns.
+"""
+import heapq
+import random
+from array import array
+import time as clock
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from .slots import FreeSlotIndex
+
+
+# Default working calendar
+START_TIME = time(7, 0)          # 7:00 AM
+END_TIME = time(16, 0)           # 4:00 PM
+BLOCKED_TIME_START = time(12, 0) # 12:00 PM
+BLOCKED_TIME_END = time(13, 0)   # 1:00 PM
+MAX_DAYS = 30                    # Maximum number of days to look ahead for scheduling
+
+HOUR = 3600
+
+PRIORITY_RANK = {'A': 0, 'B': 1, 'C': 2}
+URGENT_SLACK = 8 * HOUR  # Less spare time than about a working day before the due date
+SHORT_GAP = HOUR         # Free gaps shorter than this rarely fit a job
+
+
+def seconds(value):
+    # Seconds since midnight of a time of day
+    return value.hour * HOUR + value.minute * 60 + value.second
+
+
+def hours_to_seconds(hours):
+    # Job durations have two decimal places of an hour, a whole number of seconds
+    return int(Decimal(hours) * HOUR)
+
+
+def add_busy(busy, day, start, end):
+    # Busy calendars map each day to a flat array of start, end seconds,
+    # 8 bytes per interval instead of a tuple of two int objects
+    intervals = busy.get(day)
+    if intervals is None:
+        intervals = busy[day] = array('i')
+    intervals.append(start)
+    intervals.append(end)
+
+
+def busy_intervals(intervals):
+    # (start, end) pairs of one day of a busy calendar
+    return zip(intervals[::2], intervals[1::2])
+
+
+@dataclass
+class CalendarConfig:
+    """Working calendar the engine plans against.
+
+    `hours` maps each working weekday (0 = Monday) to its (start, end) times,
+    `blocked` periods apply to every working day and `weekday_blocked` maps a
+    weekday to periods of its own; `holidays` are dates with no work at all.
+    Each weekday is compiled once into a template of its free (start, end)
+    seconds, which get_available_time_slots overlays with a day's jobs, so
+    make a new config (dataclasses.replace) rather than changing one.
+    """
+    hours: dict = field(default_factory=lambda: {weekday: (START_TIME, END_TIME) for weekday in range(5)})
+    blocked: list = field(default_factory=lambda: [(BLOCKED_TIME_START, BLOCKED_TIME_END)])
+    weekday_blocked: dict = field(default_factory=dict)
+    holidays: frozenset = frozenset()
+    horizon_days: int = MAX_DAYS
+    templates: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.templates = tuple(self._compile(weekday) for weekday in range(7))
+
+    def _compile(self, weekday):
+        if weekday not in self.hours:
+            return ()
+        start_time, end_time = self.hours[weekday]
+        blocked = [*self.blocked, *self.weekday_blocked.get(weekday, ())]
+        return tuple(subtract_intervals(
+            [(seconds(start_time), seconds(end_time))],
+            sorted((seconds(blocked_start), seconds(blocked_end)) for blocked_start, blocked_end in blocked),
+        ))
+
+
+@dataclass(slots=True)
+class Task:
+    key: object
+    title: str
+    duration_hours: Decimal
+    urgency: int = 2
+    importance: int = 2
+    is_frog: bool = False
+    can_be_divided: bool = False
+    due_date: date = None
+    priority: str = None  # ABC class when already known, e.g. from Job.calculate_priority
+    # Days the task must not go on, e.g. those of the other chunks of its split job
+    excluded_days: frozenset = frozenset()
+    # Computed once from duration_hours, see __post_init__
+    duration_seconds: int = field(init=False, repr=False)
+    chunk_hours: tuple = field(init=False, repr=False)
+    chunk_seconds: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.duration_seconds = hours_to_seconds(self.duration_hours)
+        self.chunk_hours = tuple(self.chunks())
+        self.chunk_seconds = tuple(hours_to_seconds(hours) for hours in self.chunk_hours)
+
+    @classmethod
+    def from_job(cls, job, excluded_days=frozenset()):
+        return cls(
+            key=job.id,
+            title=job.title,
+            duration_hours=Decimal(str(job.duration_hours)),
+            urgency=job.urgency,
+            importance=job.importance,
+            is_frog=job.is_frog,
+            can_be_divided=job.can_be_divided,
+            due_date=job.due_date,
+            # Not job.priority: the generated column is not reloaded when an edited job is saved
+            priority=job.calculate_priority(),
+            excluded_days=frozenset(excluded_days),
+        )
+
+    def calculate_priority(self):
+        # ABC method, see Job.calculate_priority
+        if self.priority is not None:
+            return self.priority
+        if self.urgency == 3 and self.importance == 3:
+            return 'A'
+        elif self.urgency == 3 or self.importance == 3:
+            return 'B'
+        else:
+            return 'C'
+
+    def chunks(self):
+        # Divisible tasks longer than an hour are split into one-hour chunks
+        if not (self.can_be_divided and self.duration_hours > Decimal('1')):
+            return [self.duration_hours]
+        chunks = []
+        hours_remaining = self.duration_hours
+        while hours_remaining > Decimal('0'):
+            chunk = min(Decimal('1'), hours_remaining)
+            chunks.append(chunk)
+            hours_remaining -= chunk
+        return chunks
+
+
+@dataclass(slots=True)
+class Placement:
+    key: object
+    start: datetime
+    end: datetime
+    duration_hours: Decimal
+
+
+@dataclass
+class PlanMetrics:
+    utilization: float       # share of the horizon's working time that is booked
+    unplaced_hours: Decimal  # hours of tasks (or chunks) left out of the plan
+    short_gaps: int          # free gaps shorter than SHORT_GAP
+    capacity: int = 0        # working seconds of the horizon, which utilization is a share of
+
+    def __str__(self):
+        return f"utilization {self.utilization:.1%}, {self.unplaced_hours}h unplaced, {self.short_gaps} short gaps"
+
+    @classmethod
+    def combine(cls, metrics):
+        # Metrics of plans over separate calendars, taken together
+        capacity = sum(each.capacity for each in metrics)
+        return cls(
+            utilization=sum(each.utilization * each.capacity for each in metrics) / capacity if capacity else 0.0,
+            unplaced_hours=sum((each.unplaced_hours for each in metrics), Decimal('0')),
+            short_gaps=sum(each.short_gaps for each in metrics),
+            capacity=capacity,
+        )
+
+
+@dataclass
+class Plan:
+    placements: list = field(default_factory=list)
+    divided: set = field(default_factory=set)     # keys of tasks placed as chunks
+    unplaced: list = field(default_factory=list)  # keys of tasks with nothing placed
+    missed_deadlines: list = field(default_factory=list)  # keys of tasks not done by their due date
+    unplaced_hours: dict = field(default_factory=dict)    # key -> hours left out, for tasks not fully placed
+    metrics: PlanMetrics = None
+    greedy_metrics: PlanMetrics = None  # metrics of the greedy plan an optimized plan started from
+
+    def discard(self, keys):
+        # Forget the placements of these tasks, e.g. when they could not be written
+        keys = set(keys)
+        self.placements = [placement for placement in self.placements if placement.key not in keys]
+        self.divided -= keys
+        self.missed_deadlines = [key for key in self.missed_deadlines if key not in keys]
+        for key in keys:
+            self.unplaced_hours.pop(key, None)
+
+    def merge(self, other):
+        # Add the outcome of planning other tasks (e.g. a retry) to this plan
+        self.placements.extend(other.placements)
+        self.divided |= other.divided
+        self.unplaced.extend(other.unplaced)
+        self.missed_deadlines.extend(other.missed_deadlines)
+        self.unplaced_hours.update(other.unplaced_hours)
+        if self.metrics is None:
+            self.metrics, self.greedy_metrics = other.metrics, other.greedy_metrics
+
+    @classmethod
+    def combine(cls, plans):
+        # One plan out of plans of different tasks over separate calendars
+        combined = cls()
+        for plan in plans:
+            combined.merge(plan)
+        if len(plans) > 1:
+            combined.metrics = PlanMetrics.combine([plan.metrics for plan in plans])
+            if all(plan.greedy_metrics is not None for plan in plans):
+                combined.greedy_metrics = PlanMetrics.combine([plan.greedy_metrics for plan in plans])
+        return combined
+
+    def by_key(self):
+        placements = {}
+        for placement in self.placements:
+            placements.setdefault(placement.key, []).append(placement)
+        return placements
+
+
+def is_time_available(day, config):
+    return bool(config.templates[day.weekday()]) and day not in config.holidays
+
+
+def now_seconds(now):
+    # Seconds since midnight of `now`, rounded up so nothing is placed in the past
+    return seconds(now.time()) + (1 if now.microsecond else 0)
+
+
+def working_capacity(now, config):
+    # Free seconds of an empty calendar from now to the end of each day in the horizon, cumulated
+    total = 0
+    capacity = []
+    for offset in range(config.horizon_days):
+        day = now.date() + timedelta(days=offset)
+        if is_time_available(day, config):
+            for slot_start, slot_end in config.templates[day.weekday()]:
+                if offset == 0:
+                    slot_start = max(slot_start, now_seconds(now))
+                if slot_end > slot_start:
+                    total += slot_end - slot_start
+        capacity.append(total)
+    return capacity
+
+
+def deadline_slack(task, capacity, first_day):
+    # Working seconds to spare before the due date; None without one or past the horizon
+    if task.due_date is None:
+        return None
+    offset = (task.due_date - first_day).days
+    if offset >= len(capacity):
+        return None
+    available = capacity[offset] if offset >= 0 else 0
+    return available - task.duration_seconds
+
+
+def prioritize(tasks, capacity, first_day):
+    """Yield tasks in scheduling order, using a heap.
+
+    Tasks that will barely make their due date go first, earliest deadline
+    first. The rest follow the ABC method (A -> High Importance and Urgency,
+    B -> Medium, C -> Low), earlier due dates first within a class. Frogs go
+    before other tasks with the same standing, so they get the morning slots.
+    """
+    heap = []
+    for seq, task in enumerate(tasks):
+        rank = PRIORITY_RANK[task.calculate_priority()]
+        slack = deadline_slack(task, capacity, first_day)
+        if slack is not None and slack < URGENT_SLACK:
+            key = (0, slack, rank, not task.is_frog, seq)
+        else:
+            key = (1, rank, task.due_date or date.max, not task.is_frog, seq)
+        heap.append((key, task))
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[1]
+
+
+def subtract_intervals(slots, busy):
+    # Parts of the sorted free slots not covered by the sorted busy
+    # intervals, in a single sweep over both
+    available_slots = []
+    busy = iter(busy)
+    busy_start, busy_end = next(busy, (None, None))
+    for slot_start, slot_end in slots:
+        cursor = slot_start
+        while busy_start is not None and busy_start < slot_end:
+            if busy_start > cursor:
+                available_slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if busy_end > slot_end:
+                break  # Also overlaps the next slot
+            busy_start, busy_end = next(busy, (None, None))
+        if cursor < slot_end:
+            available_slots.append((cursor, slot_end))
+    return available_slots
+
+
+def get_available_time_slots(day, scheduled_intervals, config):
+    # Free (start, end) seconds of a day: the template of its weekday, with
+    # blocked times (e.g. lunch break) already cut out, minus the scheduled intervals
+    if not is_time_available(day, config):
+        return []
+    template = config.templates[day.weekday()]
+    if not scheduled_intervals:
+        return list(template)
+    return subtract_intervals(template, sorted(scheduled_intervals))
+
+
+def build_free_slot_index(now, busy, config, load_day=None):
+    # With load_day, each day's busy intervals are fetched the first time a
+    # search reaches it instead of being handed in up front
+    current_day = now.date()
+
+    def build_day(day):
+        if not is_time_available(day, config):
+            return []
+        day_busy = load_day(day) if load_day is not None else busy.get(day)
+        slots = get_available_time_slots(day, busy_intervals(day_busy) if day_busy else (), config)
+        if day == current_day:
+            # Avoid scheduling in the past
+            slots = [(max(slot_start, now_seconds(now)), slot_end) for slot_start, slot_end in slots]
+        return slots
+
+    def day_capacity(day):
+        if not is_time_available(day, config):
+            return 0
+        return max((end - start for start, end in config.templates[day.weekday()]), default=0)
+
+    if load_day is None:
+        return FreeSlotIndex(current_day, config.horizon_days, build_day)
+    return FreeSlotIndex(current_day, config.horizon_days, build_day, day_capacity)
+
+
+def _tracking_frogs(load_day, frog_days):
+    # Wrap load_day(day) -> (busy, has_frog) into the loader build_free_slot_index
+    # expects, adding the days that hold a frog to `frog_days` as they are loaded
+    if load_day is None:
+        return None
+
+    def load_busy(day):
+        day_busy, has_frog = load_day(day)
+        if has_frog:
+            frog_days.add(day)
+        return day_busy
+
+    return load_busy
+
+
+def plan_schedule(tasks, busy=None, now=None, config=None, frog_days=(), load_day=None, ordered=False, best_fit=False):
+    """Place `tasks` around the `busy` intervals.
+
+    `busy` maps each day to the start and end seconds since midnight of the
+    jobs already scheduled on it, see add_busy.
+
+    Tasks are placed greedily in priority order (see prioritize), each at
+    the earliest free slot from `now` on. Frog tasks get at most one frog
+    per day, counting `frog_days` that already have one, and the chunks of
+    a divided task go on different days (and none on its excluded_days).
+
+    A task with a due date is only placed on or before that day. When even
+    an empty calendar has too little time left before it (e.g. the due date
+    has passed), the task is placed as early as possible regardless, and
+    reported in `missed_deadlines`; prioritize already puts it first.
+
+    For incremental runs pass `load_day` instead of `busy`/`frog_days`:
+    load_day(day) returns that day's (busy intervals, has_frog) and is only
+    called for the days the search actually visits. Plan metrics then only
+    cover those days.
+
+    `ordered` places the tasks in the order given instead of prioritizing
+    them, and `best_fit` uses the smallest slot that fits on each day; both
+    are used by optimize_plan.
+    """
+    if now is None:
+        now = datetime.now()
+    if config is None:
+        config = CalendarConfig()
+    if busy is None:
+        busy = {}
+
+    frog_scheduled_days = set(frog_days)
+    free_slots = build_free_slot_index(now, busy, config, _tracking_frogs(load_day, frog_scheduled_days))
+    capacity = working_capacity(now, config)
+    plan = Plan()
+
+    for task in (tasks if ordered else prioritize(tasks, capacity, now.date())):
+        slack = deadline_slack(task, capacity, now.date())
+        # Too late for its due date: searching up to it would leave the task
+        # out of every run until someone edits the due date
+        late = slack is not None and slack < 0
+        last_day = None if late else task.due_date
+        chunk_days = set()
+
+        def skip_day(day):
+            return day in chunk_days or day in task.excluded_days or (task.is_frog and day in frog_scheduled_days)
+
+        for chunk_hours, chunk_seconds in zip(task.chunk_hours, task.chunk_seconds):
+            slot = free_slots.find(chunk_seconds, skip_day=skip_day, last_day=last_day, best_fit=best_fit)
+            if slot is None:
+                # No room left in the horizon (or before the due date) for this chunk
+                plan.unplaced_hours[task.key] = plan.unplaced_hours.get(task.key, Decimal('0')) + chunk_hours
+                continue
+
+            day, start, end = slot
+            free_slots.reserve(day, start, end)
+            midnight = datetime.combine(day, time.min)
+            plan.placements.append(Placement(
+                task.key, midnight + timedelta(seconds=start), midnight + timedelta(seconds=end), chunk_hours
+            ))
+            chunk_days.add(day)
+            if task.is_frog:
+                frog_scheduled_days.add(day)
+
+        if late or (task.due_date is not None and len(chunk_days) < len(task.chunk_hours)):
+            plan.missed_deadlines.append(task.key)
+        if not chunk_days:
+            plan.unplaced.append(task.key)
+        elif len(task.chunk_hours) > 1:
+            plan.divided.add(task.key)
+
+    gaps = free_slots.gaps()
+    total_capacity = capacity[-1] if capacity else 0
+    plan.metrics = PlanMetrics(
+        utilization=1 - sum(gaps) / total_capacity if total_capacity else 0.0,
+        unplaced_hours=sum(plan.unplaced_hours.values(), Decimal('0')),
+        short_gaps=sum(1 for gap in gaps if gap < SHORT_GAP),
+        capacity=total_capacity,
+    )
+    return plan
+
+
+def find_free_slots(duration_hours, load_day, now=None, config=None, is_frog=False, due_date=None, count=1):
+    """Return up to `count` of the earliest free (start, end) slots of `duration_hours`.
+
+    Nothing is placed: this answers "when would a job like this go" from the
+    calendar alone, reading days through load_day as plan_schedule does.
+    Each slot is kept free of the ones before it, so the slots are
+    alternatives that do not overlap.
+    """
+    if now is None:
+        now = datetime.now()
+    if config is None:
+        config = CalendarConfig()
+
+    frog_days = set()
+    free_slots = build_free_slot_index(now, None, config, _tracking_frogs(load_day, frog_days))
+    duration = hours_to_seconds(duration_hours)
+
+    def skip_day(day):
+        return is_frog and day in frog_days
+
+    slots = []
+    while len(slots) < count:
+        slot = free_slots.find(duration, skip_day=skip_day, last_day=due_date)
+        if slot is None:
+            break
+        day, start, end = slot
+        free_slots.reserve(day, start, end)
+        midnight = datetime.combine(day, time.min)
+        slots.append((midnight + timedelta(seconds=start), midnight + timedelta(seconds=end)))
+    return slots
+
+
+def _plan_score(plan, tasks_by_key):
+    # Lower is better: missed deadlines, then unplaced hours by ABC class, then fragmentation
+    unplaced = [Decimal('0')] * len(PRIORITY_RANK)
+    for key, hours in plan.unplaced_hours.items():
+        unplaced[PRIORITY_RANK[tasks_by_key[key].calculate_priority()]] += hours
+    return (len(plan.missed_deadlines), *unplaced, plan.metrics.short_gaps)
+
+
+def _perturb(order, plan, rng):
+    # Move a task that did not fit to an earlier position, or swap two neighbours
+    order = list(order)
+    positions = [i for i, task in enumerate(order) if task.key in plan.unplaced_hours]
+    movable = [i for i in positions if i > 0]
+    if movable:
+        i = rng.choice(movable)
+        order.insert(rng.randrange(i), order.pop(i))
+    elif len(order) > 1:
+        i = rng.randrange(len(order) - 1)
+        order[i], order[i + 1] = order[i + 1], order[i]
+    return order
+
+
+def optimize_plan(tasks, busy=None, now=None, config=None, frog_days=(), budget=0.2, seed=None):
+    """Plan like plan_schedule, then improve the plan until `budget` seconds are used.
+
+    Starts from the greedy plan and tries other placement orders (longest
+    tasks first, tasks that did not fit moved earlier) and best-fit slot
+    choice, keeping a candidate only when it misses fewer deadlines, leaves
+    fewer hours of higher-priority work unplaced, or leaves fewer short gaps.
+    Every candidate obeys the same rules as the greedy plan. The best plan
+    found is returned with the greedy plan's metrics in `greedy_metrics`.
+    """
+    deadline = clock.monotonic() + budget
+    if now is None:
+        now = datetime.now()
+    if config is None:
+        config = CalendarConfig()
+    tasks = list(tasks)
+    tasks_by_key = {task.key: task for task in tasks}
+
+    def evaluate(order, best_fit):
+        return plan_schedule(order, busy, now, config, frog_days, ordered=True, best_fit=best_fit)
+
+    order = list(prioritize(tasks, working_capacity(now, config), now.date()))
+    greedy = evaluate(order, False)
+    best, best_score, best_order, best_fit = greedy, _plan_score(greedy, tasks_by_key), order, False
+
+    longest_first = sorted(order, key=lambda task: (PRIORITY_RANK[task.calculate_priority()], -task.duration_seconds))
+    candidates = [(order, True), (longest_first, False), (longest_first, True)]
+    rng = random.Random(seed)
+
+    while clock.monotonic() < deadline and (best.unplaced_hours or best.metrics.short_gaps):
+        if candidates:
+            order, best_fit_choice = candidates.pop(0)
+        else:
+            order, best_fit_choice = _perturb(best_order, best, rng), best_fit != (rng.random() < 0.2)
+        plan = evaluate(order, best_fit_choice)
+        score = _plan_score(plan, tasks_by_key)
+        if score < best_score:
+            best, best_score, best_order, best_fit = plan, score, order, best_fit_choice
+
+    best.greedy_metrics = greedy.metrics
+    return best
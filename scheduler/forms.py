@@ -1,5 +1,5 @@
 from django import forms
-from .models import Job
+from .models import Job, WorkingCalendar
 
 class JobForm(forms.ModelForm):
     unspecific_time = forms.BooleanField(required=False, label="Schedule unspecific time?", initial=False)
@@ -7,7 +7,7 @@ class JobForm(forms.ModelForm):
 
     class Meta:
         model = Job
-        fields = ['title', 'description', 'start_time', 'date', 'due_date', 'is_frog', 'urgency', 'importance', 'can_be_divided', 'duration_hours']
+        fields = ['title', 'description', 'calendar', 'start_time', 'date', 'due_date', 'is_frog', 'urgency', 'importance', 'can_be_divided', 'duration_hours']
         widgets = {
             'start_time': forms.TimeInput(format='%H:%M', attrs={'placeholder': 'HH:MM'}),
             'date': forms.DateInput(attrs={'type': 'date'}),
@@ -24,3 +24,43 @@ class JobForm(forms.ModelForm):
             if not cleaned_data.get('date'):
                 self.add_error('date', "Please provide a date.")
         return cleaned_data
+
+
+class JobFilterForm(forms.Form):
+    # Optional server-side filters for the unscheduled job list and its export
+    urgency = forms.TypedChoiceField(
+        choices=[('', 'Any')] + Job._meta.get_field('urgency').choices,
+        coerce=int, empty_value=None, required=False,
+    )
+    importance = forms.TypedChoiceField(
+        choices=[('', 'Any')] + Job._meta.get_field('importance').choices,
+        coerce=int, empty_value=None, required=False,
+    )
+    is_frog = forms.TypedChoiceField(
+        choices=[('', 'Any'), ('1', 'Frog'), ('0', 'Not Frog')],
+        coerce=lambda value: value == '1', empty_value=None, required=False, label="Frog",
+    )
+    calendar = forms.ModelChoiceField(queryset=WorkingCalendar.objects.all(), required=False, empty_label='Any')
+    sort = forms.ChoiceField(choices=[('title', 'Title'), ('priority', 'Priority')], required=False, label="Sort by")
+
+    def filter(self, jobs):
+        for field in ('urgency', 'importance', 'is_frog', 'calendar'):
+            value = self.cleaned_data.get(field)
+            if value is not None:
+                jobs = jobs.filter(**{field: value})
+        return jobs
+
+
+class NextSlotForm(forms.Form):
+    # Query parameters of the next free slot API; flags are '1' or '0'
+    duration = forms.DecimalField(min_value=0.25, max_value=16, decimal_places=2)
+    frog = forms.TypedChoiceField(
+        choices=[('0', 'No'), ('1', 'Yes')], coerce=lambda value: value == '1', empty_value=False, required=False,
+    )
+    divide = forms.TypedChoiceField(
+        choices=[('0', 'No'), ('1', 'Yes')], coerce=lambda value: value == '1', empty_value=False, required=False,
+    )
+    due = forms.DateField(required=False)
+    count = forms.IntegerField(min_value=1, max_value=10, required=False)
+    calendar = forms.ModelChoiceField(queryset=WorkingCalendar.objects.all(), required=False)  # Default calendar when empty
+    exclude = forms.IntegerField(required=False)  # Job being edited, whose own slot counts as free
@@ -0,0 +1,134 @@
+"""Live state of the today page, pushed as server-sent events.
+
+One TodayFeed per process serves every connected today page (see
+views.today_events). A single timer re-reads the week and recurrence
+version tokens (see cache.py) and queries today's jobs only when one of
+them changed; in between it just recomputes which jobs are overdue or
+close to it. Whenever the resulting state differs from the last one, it is
+handed to every client at once. Job writes in this process wake the timer
+right away, writes in other processes are seen on its next tick.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from .cache import aweek_versions
+from .models import Job, jobs_changed, overdue_status
+from .recurrence import aoccurrences
+
+
+logger = logging.getLogger(__name__)
+
+
+def live_interval():
+    # Seconds between two ticks of the timer (and keepalives to the clients)
+    return getattr(settings, 'SCHEDULER_LIVE_INTERVAL', 10)
+
+
+async def today_rows(day):
+    # (key, title, start_time, end_time, completed) of the jobs and recurring
+    # job occurrences shown on the today page
+    jobs = Job.objects.filter(date=day).values_list('id', 'title', 'start_time', 'end_time', 'completed')
+    rows = [(f'job-{id}', title, start, end, completed) async for id, title, start, end, completed in jobs]
+    rows += [
+        (f'occurrence-{occurrence.recurring_job_id}', occurrence.title, occurrence.start_time, occurrence.end_time, False)
+        async for occurrence in aoccurrences(day, day)
+    ]
+    return rows
+
+
+def today_state(rows, now):
+    # What the today page shows of each row at `now`, as sent to the clients
+    return [
+        {
+            'key': key,
+            'title': title,
+            'start': start and start.strftime('%H:%M'),
+            'end': end and end.strftime('%H:%M'),
+            'status': overdue_status(completed, end, now),
+        }
+        for key, title, start, end, completed in rows
+    ]
+
+
+class TodayFeed:
+    def __init__(self):
+        self.subscribers = set()
+        self.state = None
+        self.rows = []
+        self.versions = None
+        self.loop = None
+        self.changed = None
+        self.task = None
+
+    def subscribe(self):
+        # Queue receiving the state whenever it changes, and None on ticks
+        # without a change (for keepalives). It holds one item: a client that
+        # falls behind only gets the latest state, see publish
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.loop = loop
+            self.changed = asyncio.Event()
+            self.versions = self.state = None
+            self.task = loop.create_task(self.run())
+        queue = asyncio.Queue(maxsize=1)
+        if self.state is not None:
+            queue.put_nowait(self.state)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, state):
+        # Hand `state` (None: unchanged) to every client. A stalled client's
+        # unread state is replaced by the newer one, and keeps it over a keepalive
+        for queue in self.subscribers:
+            if queue.full():
+                if state is None:
+                    continue
+                queue.get_nowait()
+            queue.put_nowait(state)
+
+    def wake(self):
+        # Thread safe: called after job writes commit, from whichever thread wrote
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.changed.set)
+
+    async def run(self):
+        # The timer: runs while anyone is connected
+        while self.subscribers:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Could not refresh the today feed.")
+            try:
+                await asyncio.wait_for(self.changed.wait(), live_interval())
+            except asyncio.TimeoutError:
+                pass
+            self.changed.clear()
+
+    async def refresh(self):
+        now = datetime.now()
+        # Versions are read before the jobs, so a write committed in between is seen next time
+        versions = [now.date(), *await aweek_versions(now.date())]
+        if versions != self.versions:
+            self.rows = await today_rows(now.date())
+            self.versions = versions
+        state = today_state(self.rows, now)
+        changed = state != self.state
+        self.state = state
+        self.publish(state if changed else None)
+
+
+feed = TodayFeed()
+
+
+@receiver(jobs_changed)
+def wake_feed(sender, dates, **kwargs):
+    if datetime.now().date() in dates:
+        transaction.on_commit(feed.wake)
@@ -0,0 +1,97 @@
+import json
+import platform
+import subprocess
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from scheduler.benchmarks import run_benchmarks
+
+
+def git_commit():
+    # Commit the benchmark ran on, so result files can be compared across commits
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time scheduling and the views on synthetic backlogs of growing size, in a throwaway test database, "
+        "and write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help="Backlog sizes to measure (default 100 1000 5000).")
+        parser.add_argument('--occupancy', type=float, default=0.5, help="Share of the working hours already booked (default 0.5).")
+        parser.add_argument('--calendars', type=int, default=1, help="Working calendars the jobs are spread over (default 1).")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs of each measurement (default 5).")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data (default 0).")
+        parser.add_argument('--output', help="File to write the JSON results to (default: standard output).")
+
+    def handle(self, *args, **options):
+        if any(size < 0 for size in options['sizes']):
+            raise CommandError("--sizes cannot be negative.")
+        if not 0 <= options['occupancy'] <= 1:
+            raise CommandError("--occupancy must be between 0 and 1.")
+        if options['calendars'] < 1:
+            raise CommandError("--calendars must be at least 1.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        def progress(measurement):
+            result = measurement.as_dict()
+            self.stderr.write(
+                f"{result['size']:>7} jobs  {result['name']:<32} {result['median'] * 1000:10.1f} ms  {result['queries']:>6} queries"
+            )
+
+        # Everything, the database and the cache, lives in a temporary
+        # directory: the data is generated and thrown away
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # A database file rather than SQLite's in-memory test default, like in production
+                connection.settings_dict['TEST']['NAME'] = f'{directory}/benchmark.sqlite3'
+            cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': f'{directory}/cache'}}
+
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(CACHES=cache):
+                    results = run_benchmarks(
+                        options['sizes'], options['occupancy'], options['seed'], options['repeat'], options['calendars'],
+                        progress,
+                    )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        report = json.dumps({
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version if connection.vendor == 'sqlite' else None,
+            'database': connection.vendor,
+            'sizes': options['sizes'],
+            'occupancy': options['occupancy'],
+            'calendars': options['calendars'],
+            'workers': getattr(settings, 'SCHEDULER_WORKERS', 1),
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'results': [measurement.as_dict() for measurement in results],
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} measurements to {options['output']}."))
+        else:
+            self.stdout.write(report)
@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from scheduler.models import Job
+
+
+def hot_queries():
+    # The queries every page load or scheduling run makes, as the views build them
+    today = date.today()
+    return {
+        'job_list': Job.objects.backlog().order_by('title', 'id')[:51],
+        'job_list_next_page': Job.objects.backlog().order_by(
+            'title', 'id'
+        ).keyset_after(['title', 'id'], ['m', 1])[:51],
+        'job_list_by_priority': Job.objects.backlog().order_by(
+            'priority', 'title', 'id'
+        ).keyset_after(['priority', 'title', 'id'], ['B', 'm', 1])[:51],
+        'job_list_for_calendar': Job.objects.backlog().filter(calendar_id=1).order_by('title', 'id')[:51],
+        'job_list_for_calendar_by_priority': Job.objects.backlog().filter(calendar_id=1).order_by(
+            'priority', 'title', 'id'
+        ).keyset_after(['priority', 'title', 'id'], ['B', 'm', 1])[:51],
+        'weekly_plan_view': Job.objects.filter(date__range=[today, today + timedelta(days=6)]).order_by('date', 'start_time'),
+        'today_view': Job.objects.filter(date=today).order_by('start_time'),
+        'schedule_jobs': Job.objects.filter(calendar_id=1, date__gte=today),
+    }
+
+
+class Command(BaseCommand):
+    help = "Show the query plans of the scheduler's hot queries and fail if any of them scans the whole job table or sorts outside an index."
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Plan checks only understand SQLite plans, not {connection.vendor}.")
+
+        table = Job._meta.db_table
+        problems = []
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(f"{name}:\n{plan}\n")
+            # SQLite reports "SCAN <table>" only when no index is used at all
+            if any(line.strip().endswith(f"SCAN {table}") for line in plan.splitlines()):
+                problems.append(f"{name} scans the whole table")
+            if "USE TEMP B-TREE FOR ORDER BY" in plan:
+                problems.append(f"{name} sorts outside an index")
+
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
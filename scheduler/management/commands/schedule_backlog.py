@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.scheduling import schedule_backlog
+
+
+class Command(BaseCommand):
+    help = "Schedule every unscheduled job in priority order, committing one chunk of jobs at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Jobs placed and committed per chunk (default 500).")
+        parser.add_argument('--horizon-days', type=int, help="Days to look ahead instead of each working calendar's horizon.")
+        parser.add_argument(
+            '--optimize-ms', type=int, default=0,
+            help="Milliseconds per chunk to spend improving on the greedy plan (default 0: greedy only).",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Processes planning working calendars side by side (default: one per CPU).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        if options['optimize_ms'] < 0:
+            raise CommandError("--optimize-ms cannot be negative.")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        started = time.monotonic()
+
+        def progress(processed, placed, unplaced, missed_deadlines, plan):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{processed} jobs processed, {placed} placed, {unplaced} unplaced, "
+                f"{missed_deadlines} past their due date ({processed / elapsed:.1f} jobs/s)"
+            )
+            if plan.greedy_metrics is not None:
+                self.stdout.write(f"  greedy: {plan.greedy_metrics}")
+                self.stdout.write(f"  optimized: {plan.metrics}")
+
+        optimize_budget = options['optimize_ms'] / 1000 or None
+        processed, placed, unplaced, missed_deadlines = schedule_backlog(
+            chunk_size, progress=progress, optimize_budget=optimize_budget, horizon_days=options['horizon_days'],
+            workers=options['workers'],
+        )
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Placed {placed} of {processed} jobs in {elapsed:.2f}s ({rate:.1f} jobs/s); {unplaced} left unplaced."
+        ))
+        if missed_deadlines:
+            self.stdout.write(self.style.WARNING(f"{missed_deadlines} job(s) will miss their due date."))
@@ -0,0 +1,34 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from scheduler.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Send scheduled jobs of today and the previous day whose end time has passed without being completed back "
+        "to the unscheduled list (with --interval, those since the previous sweep's day)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running and sweep every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        # The first sweep also covers the previous day, so jobs ending after a
+        # daily cron run are caught by the next one; later sweeps go back to
+        # the previous sweep's day
+        since = datetime.now().date() - timedelta(days=1)
+        while True:
+            now = datetime.now()
+            swept = Job.objects.sweep_overdue(now, since)
+            self.stdout.write(f"Unscheduled {swept} overdue job(s).")
+            if not interval:
+                break
+            since = now.date()
+            time.sleep(interval)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0004_job_completed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', False)), fields=['date', 'start_time'], name='job_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('start_time__isnull', True)), fields=['title'], name='job_unscheduled_title_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0006_job_unscheduled_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('jobs_processed', models.IntegerField(default=0)),
+                ('jobs_placed', models.IntegerField(default=0)),
+                ('jobs_unplaced', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('status',), name='one_queued_schedule_run'), models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='one_running_schedule_run')],
+            },
+        ),
+    ]
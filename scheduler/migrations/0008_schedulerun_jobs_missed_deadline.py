@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0007_schedulerun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulerun',
+            name='jobs_missed_deadline',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0008_schedulerun_jobs_missed_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='priority',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(importance=3, then=models.Value('A'), urgency=3), models.When(models.Q(('urgency', 3), ('importance', 3), _connector='OR'), then=models.Value('B')), default=models.Value('C')), output_field=models.CharField(max_length=1)),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('start_time__isnull', True)), fields=['priority', 'title', 'id'], name='job_unscheduled_priority_idx'),
+        ),
+    ]
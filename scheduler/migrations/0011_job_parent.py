@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0010_job_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_unscheduled_title_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_unscheduled_priority_idx',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='is_divided',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='scheduler.job'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('is_divided', False), ('start_time__isnull', True)), fields=['title', 'id'], name='job_unscheduled_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('is_divided', False), ('start_time__isnull', True)), fields=['priority', 'title', 'id'], name='job_unscheduled_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:43
+
+import django.db.models.deletion
+import datetime
+
+from django.db import migrations, models
+
+
+def create_default_calendar(apps, schema_editor):
+    # The hours the scheduler used before calendars were configurable
+    WorkingCalendar = apps.get_model('scheduler', 'WorkingCalendar')
+    calendar = WorkingCalendar.objects.create(name='Default', horizon_days=30, is_default=True)
+    for weekday in range(5):
+        calendar.days.create(weekday=weekday, start_time=datetime.time(7, 0), end_time=datetime.time(16, 0))
+    calendar.blocked_periods.create(start_time=datetime.time(12, 0), end_time=datetime.time(13, 0), label='Lunch break')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0011_job_parent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkingCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('horizon_days', models.PositiveIntegerField(default=30)),
+                ('is_default', models.BooleanField(default=False)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='one_default_working_calendar')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='scheduler.workingcalendar')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'date'), name='unique_holiday')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BlockedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], null=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('label', models.CharField(blank=True, max_length=100)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocked_periods', to='scheduler.workingcalendar')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='blocked_period_ends_after_start')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkingDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='scheduler.workingcalendar')),
+            ],
+            options={
+                'ordering': ['weekday'],
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'weekday'), name='unique_working_day'), models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='working_day_ends_after_start')],
+            },
+        ),
+        migrations.RunPython(create_default_calendar, migrations.RunPython.noop),
+    ]
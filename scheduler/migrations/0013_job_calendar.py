@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:46
+
+import django.db.models.deletion
+import scheduler.models
+from django.db import migrations, models
+
+
+def assign_default_calendar(apps, schema_editor):
+    # Existing jobs all shared the one calendar there was
+    WorkingCalendar = apps.get_model('scheduler', 'WorkingCalendar')
+    Job = apps.get_model('scheduler', 'Job')
+    calendar = WorkingCalendar.objects.order_by('-is_default', 'id').first()
+    if calendar is not None:
+        Job.objects.update(calendar=calendar)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0012_working_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='calendar',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='jobs', to='scheduler.workingcalendar'),
+        ),
+        migrations.RunPython(assign_default_calendar, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='job',
+            name='calendar',
+            field=models.ForeignKey(db_index=False, default=scheduler.models.default_calendar, on_delete=django.db.models.deletion.PROTECT, related_name='jobs', to='scheduler.workingcalendar'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['calendar', 'date', 'start_time'], name='job_calendar_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('is_divided', False), ('start_time__isnull', True)), fields=['calendar', 'title', 'id'], name='job_calendar_unscheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('date__isnull', True), ('is_divided', False), ('start_time__isnull', True)), fields=['calendar', 'priority', 'title', 'id'], name='job_calendar_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:52
+
+import django.core.validators
+import django.db.models.deletion
+import scheduler.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0013_job_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_frog', models.BooleanField(default=False)),
+                ('urgency', models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2)),
+                ('importance', models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Every how many days or weeks.', validators=[django.core.validators.MinValueValidator(1)])),
+                ('weekdays', models.CharField(blank=True, help_text="Weekdays as digits, 0 = Monday, e.g. 024. Weekly: the days of each week, the start date's weekday when empty. Daily: only these days, e.g. 01234 for every working day.", max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]*$', 'Use the digits 0 (Monday) to 6 (Sunday).')])),
+                ('starts_on', models.DateField()),
+                ('ends_on', models.DateField(blank=True, null=True)),
+                ('calendar', models.ForeignKey(default=scheduler.models.default_calendar, on_delete=django.db.models.deletion.PROTECT, related_name='recurring_jobs', to='scheduler.workingcalendar')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_date', models.DateField()),
+                ('job', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurrence_exception', to='scheduler.job')),
+                ('recurring_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='scheduler.recurringjob')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recurringjob',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='recurring_job_ends_after_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringjob',
+            constraint=models.CheckConstraint(condition=models.Q(('interval__gte', 1)), name='recurring_job_interval_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringjob',
+            constraint=models.CheckConstraint(condition=models.Q(('ends_on__isnull', True), ('ends_on__gte', models.F('starts_on')), _connector='OR'), name='recurring_job_ends_after_start_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurrenceexception',
+            constraint=models.UniqueConstraint(fields=('recurring_job', 'occurrence_date'), name='unique_recurrence_exception'),
+        ),
+    ]
@@ -1,4 +1,152 @@
-from django.db import models
+from contextvars import ContextVar
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator, RegexValidator
+from django.db import models, transaction
+from django.dispatch import Signal
+
+from .engine import CalendarConfig
+
+
+# Sent after every write to jobs, with the set of dates whose jobs changed
+# (None stands for the unscheduled backlog). Bulk writes send it once.
+jobs_changed = Signal()
+
+# Set while a bulk write runs its own inner update(), so it is reported once
+_bulk_write = ContextVar('job_bulk_write', default=False)
+
+
+def _dates_of(objs):
+    dates = set()
+    for obj in objs:
+        dates.add(obj.date)
+        dates.add(getattr(obj, '_loaded_date', None))
+    return dates
+
+
+class JobQuerySet(models.QuerySet):
+    def _changed_dates(self):
+        return set(self.order_by().values_list('date', flat=True).distinct())
+
+    def update(self, **kwargs):
+        kwargs.setdefault('version', models.F('version') + 1)
+        if _bulk_write.get():
+            return super().update(**kwargs)
+        dates = self._changed_dates()
+        if 'date' in kwargs and (kwargs['date'] is None or isinstance(kwargs['date'], date)):
+            dates.add(kwargs['date'])  # Jobs moved to a single new date
+        rows = super().update(**kwargs)
+        if rows:
+            jobs_changed.send(sender=self.model, dates=dates)
+        return rows
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        token = _bulk_write.set(True)
+        try:
+            rows = super().bulk_update(objs, fields, batch_size)
+        finally:
+            _bulk_write.reset(token)
+        if rows:
+            jobs_changed.send(sender=self.model, dates=_dates_of(objs))
+            for obj in objs:
+                obj._loaded_date = obj.date
+                if 'version' not in fields:
+                    obj.version += 1  # Bumped by update()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            jobs_changed.send(sender=self.model, dates=_dates_of(objs))
+        return objs
+
+    def delete(self):
+        # Chunks of deleted split jobs go with them (on_delete=CASCADE)
+        dates = self._changed_dates() | self.model.objects.filter(parent__in=self.values('id'))._changed_dates()
+        deleted = super().delete()
+        if deleted[0]:
+            jobs_changed.send(sender=self.model, dates=dates)
+        return deleted
+
+    def backlog(self):
+        # Unscheduled jobs waiting to be placed (split jobs are placed through their chunks)
+        return self.filter(date__isnull=True, start_time__isnull=True, is_divided=False)
+
+    def overdue(self, now=None, since=None):
+        # Scheduled from `since` (default: today) on, not completed, and the end time has already passed
+        now = now or datetime.now()
+        since = since or now.date()
+        return self.filter(completed=False, end_time__isnull=False, date__gte=since).filter(
+            models.Q(date__lt=now.date()) | models.Q(date=now.date(), end_time__lt=now.time())
+        )
+
+    def sweep_overdue(self, now=None, since=None):
+        # Send overdue jobs back to the unscheduled list in a single UPDATE.
+        # A chunk of a split job goes back on its own, and is placed again
+        # away from its siblings' days; moved occurrences of recurring jobs
+        # are left where they are, they are not jobs of the backlog
+        return self.overdue(now, since).filter(recurrence_exception__isnull=True).update(
+            start_time=None, end_time=None, date=None,
+        )
+
+    def keyset_after(self, fields, values):
+        # Rows after `values` in `fields` order, written as a range on the first
+        # field plus exclusions so an index on `fields` is searched, not scanned
+        jobs = self.filter(**{f'{fields[0]}__gte': values[0]})
+        for i in range(1, len(fields)):
+            lookup = 'lte' if i == len(fields) - 1 else 'lt'
+            jobs = jobs.exclude(**dict(zip(fields[:i], values[:i])), **{f'{fields[i]}__{lookup}': values[i]})
+        return jobs
+
+    def with_overdue_flags(self, now=None):
+        # Annotate is_overdue / is_close_to_overdue (ends within the hour) for
+        # jobs of now's day, in SQL; overdue_status is the same rule in Python
+        now = now or datetime.now()
+        overdue_limit, close_limit = overdue_limits(now)
+        pending = models.Q(completed=False, end_time__isnull=False)
+        return self.annotate(
+            is_overdue=models.Case(
+                models.When(pending & models.Q(end_time__lt=overdue_limit), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+            is_close_to_overdue=models.Case(
+                models.When(
+                    pending & models.Q(end_time__gte=overdue_limit, end_time__lt=close_limit),
+                    then=models.Value(True),
+                ),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
+def overdue_limits(now):
+    # Jobs of now's day ending before the first time are overdue, and those
+    # ending before the second (within the hour, at most by midnight) close to it
+    in_an_hour = now + timedelta(hours=1)
+    return now.time(), in_an_hour.time() if in_an_hour.date() == now.date() else time.max
+
+
+def overdue_status(completed, end_time, now):
+    # 'completed', 'overdue', 'close' (to overdue) or '' for a job of now's
+    # day, following Job.with_overdue_flags
+    if completed:
+        return 'completed'
+    overdue_limit, close_limit = overdue_limits(now)
+    if end_time is not None and end_time < overdue_limit:
+        return 'overdue'
+    if end_time is not None and end_time < close_limit:
+        return 'close'
+    return ''
+
+
+def default_calendar():
+    # Jobs created without a calendar go on the default one
+    return WorkingCalendar.objects.filter(is_default=True).values_list('id', flat=True).first()
+
 
 class Job(models.Model):
     title = models.CharField(max_length=255)
@@ -13,10 +161,122 @@ class Job(models.Model):
     can_be_divided = models.BooleanField(default=False)
     duration_hours = models.DecimalField(max_digits=4, decimal_places=2, default=1)
     completed = models.BooleanField(default=False)
+    # Whose time the job takes: jobs of different calendars never compete for
+    # a slot, so the scheduler plans each calendar on its own
+    calendar = models.ForeignKey(
+        'WorkingCalendar', on_delete=models.PROTECT, related_name='jobs', default=default_calendar, db_index=False,
+    )
+    # A divided job stays as the logical job, marked is_divided, and each
+    # chunk of it is a scheduled job pointing back at it
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='chunks')
+    is_divided = models.BooleanField(default=False, editable=False)
+    # Incremented on every write, so the scheduler can tell whether a job
+    # changed between planning and commit (see scheduling.find_conflicts)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # ABC class kept by the database itself, see calculate_priority
+    priority = models.GeneratedField(
+        expression=models.Case(
+            models.When(urgency=3, importance=3, then=models.Value('A')),
+            models.When(models.Q(urgency=3) | models.Q(importance=3), then=models.Value('B')),
+            default=models.Value('C'),
+        ),
+        output_field=models.CharField(max_length=1),
+        db_persist=True,
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Weekly and today views, and the scheduler's busy-interval reads.
+            # Only scheduled jobs are indexed, so unscheduled lookups use the index below
+            models.Index(
+                fields=['date', 'start_time'],
+                name='job_date_start_idx',
+                condition=models.Q(date__isnull=False),
+            ),
+            # The same per calendar, for the scheduler's busy-interval reads
+            # and the calendar foreign key
+            models.Index(fields=['calendar', 'date', 'start_time'], name='job_calendar_date_start_idx'),
+            # Unscheduled backlog (JobQuerySet.backlog) in job_list, paged by (title, id)
+            models.Index(
+                fields=['title', 'id'],
+                name='job_unscheduled_title_idx',
+                condition=models.Q(date__isnull=True, start_time__isnull=True, is_divided=False),
+            ),
+            # Unscheduled backlog by priority, for job_list and the batch scheduler
+            models.Index(
+                fields=['priority', 'title', 'id'],
+                name='job_unscheduled_priority_idx',
+                condition=models.Q(date__isnull=True, start_time__isnull=True, is_divided=False),
+            ),
+            # One calendar's backlog, for job_list filtered by calendar
+            models.Index(
+                fields=['calendar', 'title', 'id'],
+                name='job_calendar_unscheduled_idx',
+                condition=models.Q(date__isnull=True, start_time__isnull=True, is_divided=False),
+            ),
+            models.Index(
+                fields=['calendar', 'priority', 'title', 'id'],
+                name='job_calendar_priority_idx',
+                condition=models.Q(date__isnull=True, start_time__isnull=True, is_divided=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded date so moving a job also invalidates its old day
+        instance._loaded_date = instance.__dict__.get('date')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        if self._state.adding:
+            self.version += 1
+            super().save(*args, **kwargs)
+        else:
+            # Bumped from the row's version, not this instance's: a stale
+            # instance must not write a version someone already read
+            self.version = models.F('version') + 1
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields=['version'])
+        jobs_changed.send(sender=type(self), dates=_dates_of([self]))
+        self._loaded_date = self.date
+
+    def delete(self, *args, **kwargs):
+        dates = _dates_of([self])
+        if self.is_divided:
+            dates |= set(self.chunks.values_list('date', flat=True))
+        deleted = super().delete(*args, **kwargs)
+        jobs_changed.send(sender=type(self), dates=dates)
+        if self.parent_id and not Job.objects.filter(parent_id=self.parent_id).exists():
+            Job.objects.filter(id=self.parent_id).delete()  # That was the last chunk of a split job
+        return deleted
+
+    def complete(self):
+        # A split job is completed together with its last chunk
+        self.completed = True
+        self.save()
+        if self.parent_id and not Job.objects.filter(parent_id=self.parent_id, completed=False).exists():
+            Job.objects.filter(id=self.parent_id).update(completed=True)
+
+    def reset(self):
+        # Send the job back to the unscheduled list; a split job goes back whole, without its chunks
+        job = self.parent or self
+        job.chunks.all().delete()
+        job.start_time = None
+        job.end_time = None
+        job.date = None
+        job.is_divided = False
+        job.save()
+        return job
+
     def calculate_priority(self):
         # ABC method based on urgency and importance
         if self.urgency == 3 and self.importance == 3:
@@ -25,3 +285,258 @@ class Job(models.Model):
             return 'B'  # Medium priority
         else:
             return 'C'  # Lowest priority
+
+
+class ScheduleRun(models.Model):
+    # A "schedule all jobs" request, queued for the background worker (see runs.py)
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last progress of a running run, see runs.py
+    jobs_processed = models.IntegerField(default=0)
+    jobs_placed = models.IntegerField(default=0)
+    jobs_unplaced = models.IntegerField(default=0)
+    jobs_missed_deadline = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one run waits and one runs: repeated requests join the queued run
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='queued'), name='one_queued_schedule_run'),
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='running'), name='one_running_schedule_run'),
+        ]
+
+    def __str__(self):
+        return f"Schedule run {self.id} ({self.status})"
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'heartbeat_at': self.heartbeat_at,
+            'jobs_processed': self.jobs_processed,
+            'jobs_placed': self.jobs_placed,
+            'jobs_unplaced': self.jobs_unplaced,
+            'jobs_missed_deadline': self.jobs_missed_deadline,
+            'error': self.error,
+        }
+
+
+WEEKDAY_CHOICES = [
+    (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+]
+
+
+class WorkingCalendar(models.Model):
+    # Working hours the scheduler plans against; compiled and cached by calendars.py
+    name = models.CharField(max_length=100)
+    horizon_days = models.PositiveIntegerField(default=30)  # Days the scheduler looks ahead
+    is_default = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['is_default'], condition=models.Q(is_default=True), name='one_default_working_calendar'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def as_config(self):
+        # Engine view of this calendar, with its per-weekday free slot templates
+        blocked, weekday_blocked = [], {}
+        for period in self.blocked_periods.all():
+            if period.weekday is None:
+                blocked.append((period.start_time, period.end_time))
+            else:
+                weekday_blocked.setdefault(period.weekday, []).append((period.start_time, period.end_time))
+        return CalendarConfig(
+            hours={day.weekday: (day.start_time, day.end_time) for day in self.days.all()},
+            blocked=blocked,
+            weekday_blocked=weekday_blocked,
+            holidays=frozenset(holiday.date for holiday in self.holidays.all()),
+            horizon_days=self.horizon_days,
+        )
+
+
+class WorkingDay(models.Model):
+    # Working hours of one weekday; weekdays without a row are days off
+    calendar = models.ForeignKey(WorkingCalendar, on_delete=models.CASCADE, related_name='days')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['weekday']
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'weekday'], name='unique_working_day'),
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='working_day_ends_after_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class BlockedPeriod(models.Model):
+    # Time nothing gets scheduled in, e.g. the lunch break
+    calendar = models.ForeignKey(WorkingCalendar, on_delete=models.CASCADE, related_name='blocked_periods')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)  # Empty: every working day
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    label = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='blocked_period_ends_after_start'),
+        ]
+
+    def __str__(self):
+        return self.label or f"{self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class Holiday(models.Model):
+    calendar = models.ForeignKey(WorkingCalendar, on_delete=models.CASCADE, related_name='holidays')
+    date = models.DateField()
+    name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'date'], name='unique_holiday'),
+        ]
+
+    def __str__(self):
+        return self.name or str(self.date)
+
+
+class RecurringJob(models.Model):
+    """A job that repeats at a fixed time, stored once.
+
+    Occurrences are not rows: occurrence_dates() generates them for the
+    range that is asked for. Only exceptions are stored, as a
+    RecurrenceException per occurrence that was moved, completed or
+    skipped; a moved or completed occurrence is an ordinary Job from then on.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    FREQUENCY_CHOICES = [(DAILY, 'Daily'), (WEEKLY, 'Weekly')]
+
+    calendar = models.ForeignKey(WorkingCalendar, on_delete=models.PROTECT, related_name='recurring_jobs', default=default_calendar)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_frog = models.BooleanField(default=False)
+    urgency = models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2)
+    importance = models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)], help_text="Every how many days or weeks.")
+    weekdays = models.CharField(
+        max_length=7, blank=True, validators=[RegexValidator(r'^[0-6]*$', "Use the digits 0 (Monday) to 6 (Sunday).")],
+        help_text="Weekdays as digits, 0 = Monday, e.g. 024. Weekly: the days of each week, the start date's weekday "
+                  "when empty. Daily: only these days, e.g. 01234 for every working day.",
+    )
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)  # Repeats forever when empty
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='recurring_job_ends_after_start'),
+            models.CheckConstraint(condition=models.Q(interval__gte=1), name='recurring_job_interval_positive'),
+            models.CheckConstraint(
+                condition=models.Q(ends_on__isnull=True) | models.Q(ends_on__gte=models.F('starts_on')),
+                name='recurring_job_ends_after_start_date',
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def duration_hours(self):
+        seconds = (datetime.combine(date.min, self.end_time) - datetime.combine(date.min, self.start_time)).seconds
+        return (Decimal(seconds) / 3600).quantize(Decimal('0.01'))
+
+    def occurrence_dates(self, first_day, last_day):
+        # Dates the rule repeats on from first_day to last_day, exceptions
+        # included, generated one at a time without stepping through the dates in between
+        first_day = max(first_day, self.starts_on)
+        if self.ends_on is not None:
+            last_day = min(last_day, self.ends_on)
+        weekdays = sorted({int(weekday) for weekday in self.weekdays})
+
+        if self.frequency == self.DAILY:
+            day = first_day + timedelta(days=-(first_day - self.starts_on).days % self.interval)
+            while day <= last_day:
+                if not weekdays or day.weekday() in weekdays:
+                    yield day
+                day += timedelta(days=self.interval)
+            return
+
+        # Weekly: the weeks of the cycle, counted from the week of starts_on
+        first_week = self.starts_on - timedelta(days=self.starts_on.weekday())
+        week = first_day - timedelta(days=first_day.weekday())
+        week += timedelta(weeks=-((week - first_week).days // 7) % self.interval)
+        while week <= last_day:
+            for weekday in weekdays or [self.starts_on.weekday()]:
+                day = week + timedelta(days=weekday)
+                if first_day <= day <= last_day:
+                    yield day
+            week += timedelta(weeks=self.interval)
+
+    def materialize(self, day):
+        # The Job of the occurrence on `day`, stored at the rule's slot on first
+        # use so it can be moved or completed on its own; None once it was skipped
+        if next(self.occurrence_dates(day, day), None) is None:
+            raise ValueError(f"{self} does not occur on {day}")
+        with transaction.atomic():
+            exception = self.exceptions.filter(occurrence_date=day).select_related('job').first()
+            if exception is not None:
+                return exception.job
+            job = Job.objects.create(
+                calendar_id=self.calendar_id,
+                title=self.title,
+                description=self.description,
+                date=day,
+                start_time=self.start_time,
+                end_time=self.end_time,
+                duration_hours=self.duration_hours,
+                is_frog=self.is_frog,
+                urgency=self.urgency,
+                importance=self.importance,
+            )
+            self.exceptions.create(occurrence_date=day, job=job)
+        return job
+
+    def skip(self, day):
+        # Leave out the occurrence on `day`, deleting its Job if it has one
+        with transaction.atomic():
+            exception, _ = self.exceptions.get_or_create(occurrence_date=day)
+            if exception.job is not None:
+                exception.job.delete()  # The exception stays, without a job
+
+
+class RecurrenceException(models.Model):
+    # An occurrence that no longer follows its rule: replaced by `job`, or
+    # skipped when there is none (also once that job is deleted)
+    recurring_job = models.ForeignKey(RecurringJob, on_delete=models.CASCADE, related_name='exceptions')
+    occurrence_date = models.DateField()
+    job = models.OneToOneField(Job, null=True, blank=True, on_delete=models.SET_NULL, related_name='recurrence_exception')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_job', 'occurrence_date'], name='unique_recurrence_exception'),
+        ]
+
+    def __str__(self):
+        return f"{self.recurring_job} on {self.occurrence_date}"
@@ -0,0 +1,66 @@
+"""Occurrences of recurring jobs.
+
+A RecurringJob is stored once and expanded here, lazily and only for the
+dates a view or the scheduler asks for. Occurrences that were moved,
+completed or skipped have a RecurrenceException and are left out: the
+moved and completed ones are ordinary Job rows by then.
+"""
+from dataclasses import dataclass
+from datetime import date, time
+from decimal import Decimal
+
+from django.db.models import Prefetch, Q
+
+from .models import RecurrenceException, RecurringJob
+
+
+@dataclass
+class Occurrence:
+    # One occurrence of a recurring job, with the Job attributes the templates read
+    recurring_job_id: int
+    title: str
+    date: date
+    start_time: time
+    end_time: time
+    duration_hours: Decimal
+    urgency: int
+    importance: int
+    is_frog: bool
+    calendar_id: int
+    id = None  # Not stored (see RecurringJob.materialize)
+    completed = False
+    is_overdue = False
+    is_close_to_overdue = False
+
+
+def recurring_jobs(first_day, last_day, calendar_id=None):
+    # Rules that may occur in the range, with their exceptions in it
+    rules = RecurringJob.objects.filter(Q(ends_on__isnull=True) | Q(ends_on__gte=first_day), starts_on__lte=last_day)
+    if calendar_id is not None:
+        rules = rules.filter(calendar_id=calendar_id)
+    exceptions = RecurrenceException.objects.filter(occurrence_date__range=[first_day, last_day])
+    return rules.prefetch_related(Prefetch('exceptions', queryset=exceptions))
+
+
+def _expand(rule, first_day, last_day):
+    # Occurrences of one rule, its exceptions in the range prefetched
+    exception_dates = {exception.occurrence_date for exception in rule.exceptions.all()}
+    for day in rule.occurrence_dates(first_day, last_day):
+        if day not in exception_dates:
+            yield Occurrence(
+                rule.id, rule.title, day, rule.start_time, rule.end_time, rule.duration_hours,
+                rule.urgency, rule.importance, rule.is_frog, rule.calendar_id,
+            )
+
+
+def occurrences(first_day, last_day, calendar_id=None):
+    # Occurrences from first_day to last_day (of one calendar's rules), rule by rule
+    for rule in recurring_jobs(first_day, last_day, calendar_id):
+        yield from _expand(rule, first_day, last_day)
+
+
+async def aoccurrences(first_day, last_day, calendar_id=None):
+    # occurrences() for the async views
+    async for rule in recurring_jobs(first_day, last_day, calendar_id):
+        for occurrence in _expand(rule, first_day, last_day):
+            yield occurrence
@@ -0,0 +1,102 @@
+"""Background "schedule all jobs" runs.
+
+Requests only queue a ScheduleRun row and return. A single worker thread
+per process claims queued runs from the table and executes them, so the
+table doubles as the queue between processes: whichever process finishes
+its current run first picks up the next one. The table allows only one
+queued and one running run, so repeated requests join the run that is
+already waiting instead of starting another full replan.
+"""
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduleRun
+from .scheduling import schedule_backlog
+
+
+# A running run without progress for this long (or a run still queued
+# after it) belongs to a process that died
+STALE_RUN_TIMEOUT = timedelta(hours=1)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='schedule-run')
+
+
+def fail_stale_runs():
+    # Free the table of runs left behind by dead processes, so they cannot block new ones
+    limit = timezone.now() - STALE_RUN_TIMEOUT
+    # Running runs report progress after every chunk, see execute_run
+    silent = Q(heartbeat_at__lt=limit) | Q(heartbeat_at__isnull=True, started_at__lt=limit)
+    ScheduleRun.objects.filter(silent, status=ScheduleRun.RUNNING).update(
+        status=ScheduleRun.FAILED, finished_at=timezone.now(), error="Worker stopped before the run finished."
+    )
+    ScheduleRun.objects.filter(status=ScheduleRun.QUEUED, created_at__lt=limit).update(
+        status=ScheduleRun.FAILED, finished_at=timezone.now(), error="No worker picked up the run."
+    )
+
+
+def enqueue_schedule_run():
+    # Return the queued run, creating it unless one is already waiting
+    fail_stale_runs()
+    while True:
+        try:
+            with transaction.atomic():
+                run, created = ScheduleRun.objects.get_or_create(status=ScheduleRun.QUEUED)
+        except IntegrityError:
+            continue  # Another request queued one at the same moment: join it
+        break
+    # Even when joining a waiting run: the process that queued it may be gone
+    _executor.submit(drain_queue)
+    return run
+
+
+def claim_next_run():
+    # Mark the oldest queued run as running, unless a run is already running
+    fail_stale_runs()
+    run = ScheduleRun.objects.filter(status=ScheduleRun.QUEUED).order_by('id').first()
+    if run is None:
+        return None
+    try:
+        with transaction.atomic():
+            claimed = ScheduleRun.objects.filter(id=run.id, status=ScheduleRun.QUEUED).update(
+                status=ScheduleRun.RUNNING, started_at=timezone.now(), heartbeat_at=timezone.now()
+            )
+    except IntegrityError:
+        return None  # Another run is in progress; its worker picks this one up next
+    if not claimed:
+        return None
+    run.refresh_from_db()
+    return run
+
+
+def execute_run(run):
+    # Only a run still marked running is updated: one failed as stale stays failed
+    running = ScheduleRun.objects.filter(id=run.id, status=ScheduleRun.RUNNING)
+
+    def progress(processed, placed, unplaced, missed_deadlines, plan):
+        running.update(
+            jobs_processed=processed, jobs_placed=placed, jobs_unplaced=unplaced,
+            jobs_missed_deadline=missed_deadlines, heartbeat_at=timezone.now(),
+        )
+
+    try:
+        schedule_backlog(progress=progress, optimize_budget=getattr(settings, 'SCHEDULER_OPTIMIZE_SECONDS', None))
+    except Exception:
+        running.update(status=ScheduleRun.FAILED, finished_at=timezone.now(), error=traceback.format_exc())
+    else:
+        running.update(status=ScheduleRun.DONE, finished_at=timezone.now())
+
+
+def drain_queue():
+    # Runs on the worker thread: execute queued runs until none is left
+    close_old_connections()
+    try:
+        while (run := claim_next_run()) is not None:
+            execute_run(run)
+    finally:
+        close_old_connections()
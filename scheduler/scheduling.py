@@ -0,0 +1,423 @@
+"""Scheduling against the database.
+
+Loads what the engine needs from the job table, runs it, compares the
+resulting plan with the calendar and writes back only what changes.
+"""
+import multiprocessing
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .calendars import calendar_config
+from .engine import Plan, PlanMetrics, Task, add_busy, busy_intervals, optimize_plan, plan_schedule, seconds
+from .models import Job
+from .recurrence import occurrences
+
+
+# How often schedule_jobs plans a job whose placement lost to a concurrent writer
+MAX_SCHEDULE_ATTEMPTS = 3
+# Rows fetched per round trip while streaming the busy calendar
+BUSY_CHUNK_SIZE = 2000
+
+# Worker processes for plan_partitions, started on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def load_busy_intervals(existing_jobs):
+    # Busy calendar (see engine.add_busy) of the scheduled jobs in the queryset, plus
+    # the days holding a frog. Only these columns are streamed, no Job instances
+    busy = {}
+    frog_days = set()
+    rows = existing_jobs.values_list('date', 'start_time', 'end_time', 'is_frog').iterator(chunk_size=BUSY_CHUNK_SIZE)
+    for day, start_time, end_time, is_frog in rows:
+        add_busy(busy, day, seconds(start_time), seconds(end_time))
+        if is_frog:
+            frog_days.add(day)
+    return busy, frog_days
+
+
+def add_recurring_busy(busy, frog_days, calendar_id, first_day, last_day):
+    # Add the occurrences of the calendar's recurring jobs in the range to a
+    # busy calendar; stored exceptions are Job rows and come with the jobs
+    for occurrence in occurrences(first_day, last_day, calendar_id):
+        add_busy(busy, occurrence.date, seconds(occurrence.start_time), seconds(occurrence.end_time))
+        if occurrence.is_frog:
+            frog_days.add(occurrence.date)
+
+
+def plan_jobs(jobs, config=None, incremental=False, optimize_budget=None, horizon_days=None, workers=None):
+    """Plan the jobs around the calendar as it is committed now.
+
+    Jobs of different working calendars never compete for time, so each
+    calendar is planned on its own, against its own hours and busy jobs,
+    and the partitions are planned side by side (see plan_partitions).
+    `config` replaces the hours of every calendar, `horizon_days` only how
+    far ahead they look. `workers` is passed on to plan_partitions.
+    """
+    current_datetime = datetime.now()
+    current_day = current_datetime.date()
+    partitions = {}
+    for job in jobs:
+        partitions.setdefault(job.calendar_id, []).append(job)
+
+    # Existing scheduled jobs (excluding the jobs we're about to schedule, and
+    # the chunks of split jobs that are planned again)
+    existing_jobs = Job.objects.exclude(id__in=[job.id for job in jobs])
+    divided_job_ids = [job.id for job in jobs if job.is_divided]
+    if divided_job_ids:
+        existing_jobs = existing_jobs.exclude(parent_id__in=divided_job_ids)
+
+    # A chunk of a split job being placed again (e.g. after it was edited)
+    # keeps off the days of its sibling chunks
+    sibling_days = {}
+    chunk_ids = [job.id for job in jobs if job.parent_id]
+    if chunk_ids:
+        siblings = Job.objects.filter(parent_id__in={job.parent_id for job in jobs if job.parent_id}, date__isnull=False)
+        for parent_id, day in siblings.exclude(id__in=chunk_ids).values_list('parent_id', 'date'):
+            sibling_days.setdefault(parent_id, set()).add(day)
+
+    plans = []
+    work = []
+    for calendar_id, calendar_jobs in partitions.items():
+        partition_config = config or calendar_config(calendar_id)
+        if horizon_days is not None:
+            partition_config = replace(partition_config, horizon_days=horizon_days)
+        tasks = [Task.from_job(job, sibling_days.get(job.parent_id, ())) for job in calendar_jobs]
+        calendar_jobs = existing_jobs.filter(calendar_id=calendar_id)
+        # Recurring jobs of the horizon, expanded up front: the rules are few
+        last_day = current_day + timedelta(days=partition_config.horizon_days - 1)
+        recurring_busy, recurring_frog_days = {}, set()
+        add_recurring_busy(recurring_busy, recurring_frog_days, calendar_id, current_day, last_day)
+
+        if incremental:
+            # Only read the days the search walks through, one query per day
+            def load_day(day, calendar_jobs=calendar_jobs, recurring_busy=recurring_busy, recurring_frogs=recurring_frog_days):
+                busy, frog_days = load_busy_intervals(calendar_jobs.filter(date=day))
+                day_busy = busy.get(day)
+                if day in recurring_busy:
+                    day_busy = (day_busy or array('i')) + recurring_busy[day]
+                return day_busy, bool(frog_days) or day in recurring_frogs
+
+            plans.append(plan_schedule(tasks, now=current_datetime, config=partition_config, load_day=load_day))
+            continue
+
+        busy, frog_days = load_busy_intervals(calendar_jobs.filter(date__gte=current_day))
+        for day, intervals in recurring_busy.items():
+            busy[day] = busy[day] + intervals if day in busy else intervals
+        frog_days |= recurring_frog_days
+        work.append((tasks, busy, current_datetime, partition_config, frog_days))
+
+    plans.extend(plan_partitions(work, optimize_budget, workers))
+    return Plan.combine(plans)
+
+
+def process_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the web process has threads and open connections
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def plan_partitions(partitions, optimize_budget=None, workers=None):
+    """Plan independent (tasks, busy, now, config, frog_days) partitions.
+
+    The engine is pure Python, so partitions only plan in parallel in
+    separate processes: with more than one partition and `workers` (by
+    default SCHEDULER_WORKERS) above 1, they go to a process pool kept for
+    the life of the process.
+    Otherwise they are planned here, one after the other. With
+    `optimize_budget`, each partition's plan is optimized for that long.
+    """
+    global _pool
+    if optimize_budget:
+        # Spend up to optimize_budget seconds improving on the greedy plan
+        planner = partial(optimize_plan, budget=optimize_budget)
+    else:
+        planner = plan_schedule
+    workers = workers or getattr(settings, 'SCHEDULER_WORKERS', 1)
+    if workers <= 1 or len(partitions) <= 1:
+        return [planner(*partition) for partition in partitions]
+
+    try:
+        futures = [process_pool(workers).submit(planner, *partition) for partition in partitions]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        # A worker died: plan here this time and start a new pool next time
+        with _pool_lock:
+            _pool = None
+        return [planner(*partition) for partition in partitions]
+
+
+@dataclass
+class JobChange:
+    # What writing a plan does to one job
+    PLACED = 'placed'            # from the backlog into a slot
+    MOVED = 'moved'              # from one slot to another
+    DIVIDED = 'divided'          # replaced by chunk jobs
+    UNSCHEDULED = 'unscheduled'  # back to the backlog (replans only)
+    UNPLACED = 'unplaced'        # stays in the backlog; nothing is written
+
+    job_id: int
+    version: int
+    title: str
+    action: str
+    before: tuple = None  # (date, start_time, end_time), of the first chunk for split jobs, None while unscheduled
+    after: list = field(default_factory=list)  # (date, start_time, end_time, duration_hours) per new slot
+
+
+def diff_plan(jobs, plan):
+    """Compare the plan with the jobs as loaded.
+
+    Returns the changes applying the plan would make and the number of
+    jobs it leaves where they are, which are not written at all.
+    """
+    changes = []
+    unchanged = 0
+    placements_by_job = plan.by_key()
+
+    # Current chunks of split jobs that were planned again
+    chunk_slots = {}
+    chunks = Job.objects.filter(parent_id__in=[job.id for job in jobs if job.is_divided]).order_by('date', 'start_time')
+    for parent_id, day, start_time, end_time in chunks.values_list('parent_id', 'date', 'start_time', 'end_time'):
+        chunk_slots.setdefault(parent_id, []).append((day, start_time, end_time))
+
+    for job in jobs:
+        before = (job.date, job.start_time, job.end_time) if job.date and job.start_time else None
+        if job.is_divided:
+            before = chunk_slots[job.id][0] if job.id in chunk_slots else None
+        after = [
+            (placement.start.date(), placement.start.time(), placement.end.time(), placement.duration_hours)
+            for placement in placements_by_job.get(job.id, ())
+        ]
+        if job.id in plan.divided:
+            if sorted(slot[:3] for slot in after) == chunk_slots.get(job.id):
+                unchanged += 1
+                continue
+            action = JobChange.DIVIDED
+        elif after:
+            if before == after[0][:3] and not job.is_divided:
+                unchanged += 1
+                continue
+            action = JobChange.PLACED if before is None else JobChange.MOVED
+        else:
+            action = JobChange.UNPLACED if before is None else JobChange.UNSCHEDULED
+        changes.append(JobChange(job.id, job.version, job.title, action, before, after))
+    return changes, unchanged
+
+
+def find_conflicts(changes, current):
+    """Return the ids of the changed jobs that can no longer be written.
+
+    `current` maps job ids to the jobs as committed, read inside the write
+    transaction. A job conflicts when another writer changed it after it
+    was loaded (its version moved on, e.g. it was placed or split by a
+    concurrent run), or when one of its new slots overlaps a job committed
+    since the calendar was read or puts a second frog on a day.
+    """
+    conflicts = {
+        change.job_id for change in changes
+        if change.job_id not in current or current[change.job_id].version != change.version
+    }
+
+    # Compare against everything committed on the new slots' days except our
+    # own unchanged rows and the chunks they replace; a job of ours that
+    # another run placed meanwhile counts as busy. Only jobs of the same
+    # working calendar can overlap
+    ours = [change.job_id for change in changes if change.job_id not in conflicts]
+    changes_by_calendar = {}
+    for change in changes:
+        if change.job_id not in conflicts:
+            changes_by_calendar.setdefault(current[change.job_id].calendar_id, []).append(change)
+
+    for calendar_id, calendar_changes in changes_by_calendar.items():
+        days = {slot[0] for change in calendar_changes for slot in change.after}
+        if not days:
+            continue  # Only jobs going back to the backlog
+        busy, frog_days = load_busy_intervals(
+            Job.objects.filter(calendar_id=calendar_id, date__in=days).exclude(id__in=ours).exclude(parent_id__in=ours)
+        )
+        add_recurring_busy(busy, frog_days, calendar_id, min(days), max(days))
+        for change in calendar_changes:
+            for day, start_time, end_time, _ in change.after:
+                start, end = seconds(start_time), seconds(end_time)
+                if current[change.job_id].is_frog and day in frog_days:
+                    conflicts.add(change.job_id)
+                elif any(busy_start < end and start < busy_end for busy_start, busy_end in busy_intervals(busy.get(day, ()))):
+                    conflicts.add(change.job_id)
+    return conflicts
+
+
+def apply_changes(changes, partial=True):
+    """Write the changes in one transaction, touching only the rows that change.
+
+    Returns the ids of the conflicting jobs (see find_conflicts). Those are
+    skipped, or with `partial=False` nothing at all is written.
+    """
+    changes = [change for change in changes if change.action != JobChange.UNPLACED]
+    if not changes:
+        return set()
+
+    with transaction.atomic():
+        current = Job.objects.select_for_update().in_bulk([change.job_id for change in changes])
+        conflicts = find_conflicts(changes, current)
+        if conflicts and not partial:
+            return conflicts
+
+        updated_jobs = []
+        chunk_jobs = []
+        replaced_chunks_of = []
+        for change in changes:
+            if change.job_id in conflicts:
+                continue
+            job = current[change.job_id]
+            if job.is_divided:
+                replaced_chunks_of.append(job.id)  # Its old chunks make way for the new placement
+            if change.action != JobChange.DIVIDED:
+                # Move the job, or send it back to the backlog
+                job.date, job.start_time, job.end_time = change.after[0][:3] if change.after else (None, None, None)
+                job.is_divided = False
+                updated_jobs.append(job)
+                continue
+
+            # The job was divided: it stays unscheduled as the parent of one job per chunk.
+            # Chunks repeat the fields the views and the scheduler read, so they are ordinary jobs
+            for day, start_time, end_time, duration_hours in change.after:
+                chunk_jobs.append(Job(
+                    parent=job,
+                    calendar_id=job.calendar_id,
+                    title=job.title,
+                    urgency=job.urgency,
+                    importance=job.importance,
+                    start_time=start_time,
+                    date=day,
+                    end_time=end_time,
+                    duration_hours=duration_hours,
+                    is_frog=job.is_frog,
+                ))
+            job.date = job.start_time = job.end_time = None
+            job.is_divided = True
+            updated_jobs.append(job)
+
+        if replaced_chunks_of:
+            Job.objects.filter(parent_id__in=replaced_chunks_of).delete()
+        if updated_jobs:
+            Job.objects.bulk_update(updated_jobs, ['date', 'start_time', 'end_time', 'is_divided'])
+        if chunk_jobs:
+            Job.objects.bulk_create(chunk_jobs)
+    return conflicts
+
+
+@dataclass
+class PlanPreview:
+    # A plan that was computed but not written, see preview_schedule
+    changes: list
+    unchanged: int
+    replan: bool
+    metrics: PlanMetrics = None
+
+    def by_action(self):
+        changes = {}
+        for change in self.changes:
+            changes.setdefault(change.action, []).append(change)
+        return changes
+
+
+def preview_schedule(replan=False, config=None):
+    """Plan the backlog without writing anything.
+
+    With `replan`, upcoming jobs that are not completed are planned again
+    as well, as if all jobs had been reset and scheduled. Applying the
+    preview with apply_changes(preview.changes, partial=False) then only
+    writes the jobs that end up somewhere else.
+    """
+    now = datetime.now()
+    movable = Q(date__isnull=True, start_time__isnull=True, is_divided=False)  # The backlog
+    if replan:
+        # Jobs that have started (or ended) stay where they are, and so do the
+        # chunks of a split job unless none of them has started yet
+        upcoming = Q(completed=False) & (Q(date__gt=now.date()) | Q(date=now.date(), start_time__gte=now.time()))
+        fixed_chunks = Job.objects.filter(parent=OuterRef('pk')).exclude(upcoming)
+        # Moved occurrences of recurring jobs stay at their time, like their rule
+        upcoming &= Q(recurrence_exception__isnull=True)
+        movable |= (upcoming & Q(parent__isnull=True)) | (Q(is_divided=True, completed=False) & ~Exists(fixed_chunks))
+    # Same order as schedule_backlog, so an unchanged calendar plans out the same
+    jobs = list(Job.objects.filter(movable).order_by('priority', 'title', 'id'))
+    plan = plan_jobs(jobs, config)
+    changes, unchanged = diff_plan(jobs, plan)
+    return PlanPreview(changes, unchanged, replan, plan.metrics)
+
+
+def schedule_jobs(jobs, config=None, incremental=False, optimize_budget=None, horizon_days=None, workers=None):
+    """Place the unscheduled jobs among the scheduled ones and write the result.
+
+    Several schedulers may run at once: placements that conflict with a
+    concurrent writer are dropped at commit time (see find_conflicts), and
+    only those jobs are reloaded and planned again, up to
+    MAX_SCHEDULE_ATTEMPTS times in all. Returns the combined plan.
+    """
+    # Skip manually scheduled jobs, and split jobs, which are placed through their chunks
+    jobs = [job for job in jobs if not (job.start_time and job.date) and not job.is_divided]
+    plan = Plan()
+    for attempt in range(MAX_SCHEDULE_ATTEMPTS):
+        attempt_plan = plan_jobs(jobs, config, incremental, optimize_budget, horizon_days, workers)
+        changes, _ = diff_plan(jobs, attempt_plan)
+        conflicts = apply_changes(changes)
+        attempt_plan.discard(conflicts)
+        plan.merge(attempt_plan)
+        # Reload the conflicting jobs; those another writer already placed or deleted are done
+        jobs = [
+            job for job in Job.objects.filter(id__in=conflicts)
+            if not (job.start_time and job.date) and not job.is_divided
+        ]
+        if not jobs:
+            break
+    plan.unplaced.extend(job.id for job in jobs)  # Still conflicting after the last attempt
+    return plan
+
+
+def schedule_backlog(chunk_size=500, config=None, progress=None, optimize_budget=None, horizon_days=None, workers=None):
+    """Schedule every unscheduled job in priority order, one committed chunk at a time.
+
+    Calls progress(processed, placed, unplaced, missed_deadlines, plan) after
+    each chunk and returns the final counts in the same order (without the
+    plan). With `optimize_budget`, each chunk's plan is optimized for up to
+    that many seconds before it is written. The jobs of each chunk are
+    planned per working calendar, in up to `workers` processes, see plan_jobs.
+    """
+    backlog = Job.objects.backlog().defer('description')  # The scheduler never reads descriptions
+    ordering = ['priority', 'title', 'id']
+    processed = placed = unplaced = missed_deadlines = 0
+    last_key = None
+
+    while True:
+        # Keyset on the priority index: jobs left unplaced by an earlier chunk are not read again
+        chunk = backlog.order_by(*ordering)
+        if last_key is not None:
+            chunk = chunk.keyset_after(ordering, last_key)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        last_key = [getattr(chunk[-1], field) for field in ordering]
+
+        plan = schedule_jobs(  # Commits this chunk
+            chunk, config, optimize_budget=optimize_budget, horizon_days=horizon_days, workers=workers,
+        )
+        processed += len(chunk)
+        unplaced += len(plan.unplaced)
+        placed += len(chunk) - len(plan.unplaced)
+        missed_deadlines += len(plan.missed_deadlines)
+        if progress is not None:
+            progress(processed, placed, unplaced, missed_deadlines, plan)
+
+    return processed, placed, unplaced, missed_deadlines
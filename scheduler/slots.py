@@ -0,0 +1,169 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+
+NO_GAP = 0
+
+
+class DayFreeList:
+    # Sorted, non-overlapping free slots of a single day, kept as two
+    # parallel lists so a slot can be located with bisect. Times are
+    # integer seconds since midnight.
+
+    def __init__(self, slots):
+        slots = sorted((start, end) for start, end in slots if end > start)
+        self.starts = [start for start, _ in slots]
+        self.ends = [end for _, end in slots]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def largest_gap(self):
+        return max((end - start for start, end in self), default=NO_GAP)
+
+    def first_fit(self, duration):
+        # Earliest start of a free slot that can hold `duration`
+        for start, end in self:
+            if end - start >= duration:
+                return start
+        return None
+
+    def best_fit(self, duration):
+        # Start of the smallest free slot that can hold `duration`, earliest on ties
+        fits = [(end - start, start) for start, end in self if end - start >= duration]
+        return min(fits)[1] if fits else None
+
+    def reserve(self, start, end):
+        # Carve [start, end) out of the free slot that contains it
+        i = bisect_right(self.starts, start) - 1
+        if i < 0 or end > self.ends[i]:
+            raise ValueError(f"{start // 3600:02}:{start // 60 % 60:02}-{end // 3600:02}:{end // 60 % 60:02} is not free")
+
+        slot_start, slot_end = self.starts[i], self.ends[i]
+        del self.starts[i], self.ends[i]
+        if end < slot_end:
+            self.starts.insert(i, end)
+            self.ends.insert(i, slot_end)
+        if slot_start < start:
+            self.starts.insert(i, slot_start)
+            self.ends.insert(i, start)
+
+
+class FreeSlotIndex:
+    """Free time of every day in the scheduling horizon.
+
+    Each day keeps its own sorted free list, split in place when a slot is
+    reserved. A max segment tree over the largest gap of each day answers
+    "first day on or after D with room for N" in O(log n), so days that are
+    already full are skipped without being looked at. Times and durations
+    are integer seconds, times counted from the midnight of their day.
+
+    When `day_capacity` is given, days are built lazily: until a search
+    reaches a day, its leaf holds day_capacity(day), an upper bound on its
+    largest gap, and build_day is only called for the days actually visited.
+    """
+
+    def __init__(self, first_day, horizon_days, build_day, day_capacity=None):
+        # build_day(day) returns the free (start, end) seconds of that day
+        self.first_day = first_day
+        self.horizon_days = horizon_days
+        self._build_day = build_day
+        self.days = [None] * horizon_days
+        if day_capacity is None:
+            for offset in range(horizon_days):
+                self._build(offset)
+
+        size = 1
+        while size < max(horizon_days, 1):
+            size *= 2
+        self._size = size
+        self._tree = [NO_GAP] * (2 * size)
+        for offset, free_list in enumerate(self.days):
+            if free_list is None:
+                self._tree[size + offset] = day_capacity(first_day + timedelta(days=offset))
+            else:
+                self._tree[size + offset] = free_list.largest_gap()
+        for node in range(size - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def _offset(self, day):
+        return (day - self.first_day).days
+
+    def _build(self, offset):
+        self.days[offset] = DayFreeList(self._build_day(self.first_day + timedelta(days=offset)))
+        return self.days[offset]
+
+    def _day(self, offset):
+        free_list = self.days[offset]
+        if free_list is None:
+            free_list = self._build(offset)
+            self._refresh(offset)
+        return free_list
+
+    def _refresh(self, offset):
+        node = self._size + offset
+        self._tree[node] = self.days[offset].largest_gap()
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    def _first_day_with_room(self, lo, duration, node=1, node_lo=0, node_hi=None):
+        if node_hi is None:
+            node_hi = self._size - 1
+        if node_hi < lo or self._tree[node] < duration:
+            return None
+        if node_lo == node_hi:
+            return node_lo
+        mid = (node_lo + node_hi) // 2
+        found = self._first_day_with_room(lo, duration, 2 * node, node_lo, mid)
+        if found is None:
+            found = self._first_day_with_room(lo, duration, 2 * node + 1, mid + 1, node_hi)
+        return found
+
+    def free_slots(self, day):
+        offset = self._offset(day)
+        if 0 <= offset < self.horizon_days:
+            return list(self._day(offset))
+        return []
+
+    def find(self, duration, start_day=None, skip_day=None, last_day=None, best_fit=False):
+        """Return the earliest free (day, start, end) of `duration` seconds, or None.
+
+        The search runs from `start_day` to `last_day` (the whole index by
+        default) and never picks a day for which skip_day(day) is true.
+        On the chosen day the first slot that fits is used, or with
+        `best_fit` the smallest one, which leaves fewer unusable gaps.
+        """
+        lo = 0 if start_day is None else max(self._offset(start_day), 0)
+        hi = self.horizon_days - 1 if last_day is None else min(self._offset(last_day), self.horizon_days - 1)
+        while lo <= hi:
+            offset = self._first_day_with_room(lo, duration)
+            if offset is None or offset > hi:
+                return None
+            if self.days[offset] is None:
+                # Only an upper bound so far: build the day and search again
+                self._day(offset)
+                continue
+            day = self.first_day + timedelta(days=offset)
+            if skip_day is not None and skip_day(day):
+                lo = offset + 1
+                continue
+            if best_fit:
+                start = self.days[offset].best_fit(duration)
+            else:
+                start = self.days[offset].first_fit(duration)
+            return day, start, start + duration
+        return None
+
+    def gaps(self):
+        # Lengths of the free slots of every day built so far
+        return [end - start for free_list in self.days if free_list is not None for start, end in free_list]
+
+    def reserve(self, day, start, end):
+        offset = self._offset(day)
+        self._day(offset).reserve(start, end)
+        self._refresh(offset)
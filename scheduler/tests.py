@@ -1,3 +1,530 @@
-from django.test import TestCase
+import asyncio
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .engine import Task, add_busy, plan_schedule, subtract_intervals
+from .live import TodayFeed, feed
+from .models import Job, RecurringJob, ScheduleRun, default_calendar, overdue_status
+from .runs import claim_next_run, enqueue_schedule_run, execute_run
+from .scheduling import (
+    JobChange, apply_changes, find_conflicts, plan_jobs, plan_partitions, preview_schedule,
+    schedule_backlog, schedule_jobs,
+)
+from .slots import FreeSlotIndex
+from .views import today_events
+
+
+# Tests never read or fill the cache of the development server
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def next_working_days(count):
+    # The next `count` weekdays after today, in the default calendar's hours
+    days = []
+    day = datetime.now().date()
+    while len(days) < count:
+        day += timedelta(days=1)
+        if day.weekday() < 5:
+            days.append(day)
+    return days
+
+
+@override_settings(SCHEDULER_OPTIMIZE_SECONDS=0)
+class ScheduleRunTests(TestCase):
+    def test_orphaned_queued_run_is_drained(self):
+        # A run left running by a dead process, and the run queued behind it
+        stale = ScheduleRun.objects.create(status=ScheduleRun.RUNNING, started_at=timezone.now() - timedelta(hours=2))
+        queued = ScheduleRun.objects.create(status=ScheduleRun.QUEUED)
+        job = Job.objects.create(title="Backlog job", duration_hours=Decimal('1'))
+
+        with mock.patch('scheduler.runs._executor') as executor:
+            self.assertEqual(enqueue_schedule_run(), queued)
+            self.assertEqual(enqueue_schedule_run(), queued)
+        self.assertEqual(executor.submit.call_count, 2)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ScheduleRun.FAILED)
+        run = claim_next_run()
+        self.assertEqual(run, queued)
+        execute_run(run)
+        run.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(run.status, ScheduleRun.DONE)
+        self.assertIsNotNone(job.date)
+
+    def test_long_run_with_progress_is_not_stale(self):
+        ScheduleRun.objects.create(
+            status=ScheduleRun.RUNNING, started_at=timezone.now() - timedelta(hours=2), heartbeat_at=timezone.now(),
+        )
+        with mock.patch('scheduler.runs._executor'):
+            enqueue_schedule_run()
+        self.assertIsNone(claim_next_run())
+        self.assertEqual(ScheduleRun.objects.filter(status=ScheduleRun.RUNNING).count(), 1)
+
+    def test_run_failed_as_stale_stays_failed(self):
+        Job.objects.create(title="Backlog job", duration_hours=Decimal('1'))
+        ScheduleRun.objects.create(status=ScheduleRun.QUEUED)
+        run = claim_next_run()
+        heartbeat = ScheduleRun.objects.get(id=run.id).heartbeat_at
+
+        def fail_run(*args, **kwargs):
+            ScheduleRun.objects.filter(id=run.id).update(status=ScheduleRun.FAILED)
+            return schedule_backlog(*args, **kwargs)
+
+        with mock.patch('scheduler.runs.schedule_backlog', side_effect=fail_run):
+            execute_run(run)
+        run.refresh_from_db()
+        self.assertEqual(run.status, ScheduleRun.FAILED)
+        self.assertEqual(run.heartbeat_at, heartbeat)
+        self.assertIsNone(run.finished_at)
+
+    def test_stale_queued_run_is_replaced(self):
+        stale = ScheduleRun.objects.create(status=ScheduleRun.QUEUED)
+        ScheduleRun.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(hours=2))
+
+        with mock.patch('scheduler.runs._executor'):
+            run = enqueue_schedule_run()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ScheduleRun.FAILED)
+        self.assertNotEqual(run, stale)
+        self.assertEqual(run.status, ScheduleRun.QUEUED)
+
+
+class JobVersionTests(TestCase):
+    def test_stale_instance_moves_the_version_on(self):
+        stale = Job.objects.create(title="Job", duration_hours=Decimal('1'))
+        Job.objects.filter(id=stale.id).update(title="Renamed")
+        loaded = Job.objects.get(id=stale.id)  # What a scheduler plans with
+
+        stale.description = "Edited"
+        stale.save()
+        self.assertEqual(stale.version, loaded.version + 1)
+
+        change = JobChange(loaded.id, loaded.version, loaded.title, JobChange.PLACED, None, [
+            (date(2030, 1, 7), time(7), time(8), Decimal('1')),
+        ])
+        self.assertEqual(find_conflicts([change], Job.objects.in_bulk([loaded.id])), {loaded.id})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCHEDULER_AUTO_PLACE=True)
+class EditSplitJobTests(TestCase):
+    def setUp(self):
+        # Nothing fits before the split job's days
+        today = datetime.now().date()
+        Job.objects.create(title="Busy", date=today, start_time=time(7), end_time=time(16), duration_hours=Decimal('9'))
+        self.days = next_working_days(2)
+        self.parent = Job.objects.create(
+            title="Report", duration_hours=Decimal('2'), can_be_divided=True, is_divided=True,
+        )
+        self.chunks = [
+            Job.objects.create(
+                title="Report", parent=self.parent, date=day, start_time=time(7), end_time=time(8),
+                duration_hours=Decimal('1'),
+            )
+            for day in self.days
+        ]
+
+    def post(self, job, **data):
+        data = {
+            'title': job.title, 'description': '', 'calendar': default_calendar(), 'urgency': 2, 'importance': 2,
+            'duration_hours': job.duration_hours, 'can_be_divided': 'on' if job.can_be_divided else '',
+            'unspecific_time': 'on', **data,
+        }
+        return self.client.post(reverse('edit_job', args=[job.id]), data)
+
+    def test_edited_chunk_keeps_off_its_siblings_days(self):
+        self.post(self.chunks[1])
+        chunk = Job.objects.get(id=self.chunks[1].id)
+        self.assertIsNotNone(chunk.date)
+        self.assertNotEqual(chunk.date, self.days[0])
+
+    def test_edited_parent_is_split_again(self):
+        self.post(self.parent, title="Annual report", duration_hours='3')
+        chunks = Job.objects.filter(parent=self.parent)
+        self.assertFalse(chunks.filter(id__in=[chunk.id for chunk in self.chunks]).exists())
+        self.assertEqual(chunks.count(), 3)
+        self.assertEqual(set(chunks.values_list('title', flat=True)), {"Annual report"})
+        self.assertEqual(len(set(chunks.values_list('date', flat=True))), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JsonApiTests(TestCase):
+    def test_etag_changes_with_the_day_within_the_same_second(self):
+        day = next_working_days(1)[0]
+        url = reverse('api_day', args=[day.isoformat()])
+        Job.objects.create(title="First", date=day, start_time=time(7), end_time=time(8), duration_hours=Decimal('1'))
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(title="Second", date=day, start_time=time(8), end_time=time(9), duration_hours=Decimal('1'))
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([job['title'] for job in response.json()['jobs']], ["First", "Second"])
+
+    def test_backlog_etag_changes_with_the_backlog(self):
+        url = reverse('api_jobs')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(title="Backlog job", duration_hours=Decimal('1'))
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['jobs']), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobListCursorTests(TestCase):
+    def test_cursor_of_the_wrong_types_is_ignored(self):
+        Job.objects.create(title="Backlog job", duration_hours=Decimal('1'))
+        for cursor in ['["a","x"]', '[null,1]', '[1,"a"]', '["a",true]']:
+            for url in [reverse('job_list'), reverse('api_jobs')]:
+                response = self.client.get(url, {'after': cursor})
+                self.assertEqual(response.status_code, 200, (url, cursor))
+        self.assertEqual(len(self.client.get(reverse('api_jobs'), {'after': '["a","x"]'}).json()['jobs']), 1)
+
+
+class SweepOverdueTests(TestCase):
+    def job(self, title, day, end, **fields):
+        start = time(end.hour - 1)
+        return Job.objects.create(title=title, date=day, start_time=start, end_time=end, duration_hours=Decimal('1'), **fields)
+
+    def test_only_todays_own_jobs_are_swept(self):
+        now = datetime(2030, 1, 8, 12, 0)
+        today, yesterday = now.date(), now.date() - timedelta(days=1)
+        ended = self.job("Ended", today, time(10))
+        upcoming = self.job("Upcoming", today, time(14))
+        old = self.job("Old", yesterday, time(10))
+        parent = Job.objects.create(title="Split", duration_hours=Decimal('2'), is_divided=True)
+        chunk = self.job("Split", today, time(9), parent=parent)
+        rule = RecurringJob.objects.create(
+            title="Standup", start_time=time(8), end_time=time(9), frequency=RecurringJob.DAILY, starts_on=today,
+        )
+        occurrence = rule.materialize(today)
+
+        self.assertEqual(Job.objects.sweep_overdue(now), 2)
+        self.assertEqual(set(Job.objects.backlog().values_list('id', flat=True)), {ended.id, chunk.id})
+        self.assertEqual(
+            set(Job.objects.filter(date__isnull=False).values_list('id', flat=True)),
+            {upcoming.id, old.id, occurrence.id},
+        )
+
+        # The day of the previous sweep
+        self.assertEqual(Job.objects.sweep_overdue(now, since=yesterday), 1)
+        old.refresh_from_db()
+        self.assertIsNone(old.date)
+
+    @override_settings(CACHES=LOCMEM_CACHES, SCHEDULER_OPTIMIZE_SECONDS=0)
+    def test_overdue_chunk_is_placed_again_off_its_siblings_days(self):
+        today = datetime.now().date()
+        days = next_working_days(2)
+        parent = Job.objects.create(title="Report", duration_hours=Decimal('3'), can_be_divided=True, is_divided=True)
+        overdue = self.job("Report", today - timedelta(days=1), time(8), parent=parent)
+        for day in days:
+            self.job("Report", day, time(8), parent=parent)
+
+        self.assertEqual(Job.objects.sweep_overdue(since=today - timedelta(days=1)), 1)
+        schedule_backlog()
+        overdue.refresh_from_db()
+        parent.refresh_from_db()
+        self.assertTrue(parent.is_divided)
+        self.assertEqual(overdue.parent, parent)
+        self.assertIsNotNone(overdue.date)
+        self.assertGreaterEqual(overdue.date, today)
+        self.assertNotIn(overdue.date, days)
+
+    def test_one_shot_command_covers_the_previous_day(self):
+        today = datetime.now().date()
+        yesterday = self.job("Yesterday", today - timedelta(days=1), time(10))
+        older = self.job("Older", today - timedelta(days=2), time(10))
+        call_command('sweep_overdue', stdout=StringIO())
+        yesterday.refresh_from_db()
+        older.refresh_from_db()
+        self.assertIsNone(yesterday.date)
+        self.assertIsNotNone(older.date)
+
+
+class PlanPartitionsTests(TestCase):
+    def test_web_processes_plan_without_a_pool(self):
+        partitions = [([], {}, datetime(2030, 1, 7, 8), None, set())] * 2
+        with mock.patch('scheduler.scheduling.process_pool') as process_pool:
+            self.assertEqual(len(plan_partitions(partitions)), 2)
+        process_pool.assert_not_called()
+
+
+class OverdueStatusTests(TestCase):
+    def test_python_rule_matches_the_sql_annotation(self):
+        day = date(2030, 1, 8)
+        for end in [time(9), time(10, 30), time(11, 15), time(23, 45), time(23, 59)]:
+            Job.objects.create(title=str(end), date=day, start_time=time(8), end_time=end, duration_hours=Decimal('1'))
+        Job.objects.create(title="Done", date=day, start_time=time(8), end_time=time(9), duration_hours=Decimal('1'), completed=True)
+
+        for now in [datetime(2030, 1, 8, 10, 30), datetime(2030, 1, 8, 23, 30)]:
+            for job in Job.objects.filter(date=day).with_overdue_flags(now):
+                status = overdue_status(job.completed, job.end_time, now)
+                self.assertEqual(status == 'overdue', job.is_overdue, (now, job.title))
+                self.assertEqual(status == 'close', job.is_close_to_overdue, (now, job.title))
+                self.assertEqual(status == 'completed', job.completed, (now, job.title))
+
+
+class FreeSlotIndexTests(SimpleTestCase):
+    first_day = date(2030, 1, 7)
+
+    def index(self, free, day_capacity=None):
+        # free maps day offsets to their free (start, end) seconds, days not in it are full
+        built = []
+
+        def build_day(day):
+            built.append(day)
+            return free.get((day - self.first_day).days, [])
+
+        return FreeSlotIndex(self.first_day, 10, build_day, day_capacity), built
+
+    def test_finds_the_first_day_with_room(self):
+        index, _ = self.index({1: [(0, 1800)], 3: [(0, 1800), (3600, 10800)], 6: [(0, 7200)]})
+        day = self.first_day + timedelta(days=3)
+        self.assertEqual(index.find(3600), (day, 3600, 7200))
+        self.assertEqual(index.find(3600, best_fit=True), (day, 3600, 7200))
+        self.assertEqual(index.find(1800, best_fit=True, start_day=day), (day, 0, 1800))
+        self.assertEqual(index.find(3600, skip_day=lambda each: each == day)[0], self.first_day + timedelta(days=6))
+        self.assertIsNone(index.find(3600, last_day=day - timedelta(days=1)))
+        self.assertIsNone(index.find(10800))
+
+    def test_reserve_splits_the_slot_and_updates_the_tree(self):
+        index, _ = self.index({3: [(0, 10800)], 6: [(0, 7200)]})
+        day = self.first_day + timedelta(days=3)
+        index.reserve(day, 3600, 5400)
+        self.assertEqual(index.free_slots(day), [(0, 3600), (5400, 10800)])
+        self.assertEqual(index.find(7200)[0], self.first_day + timedelta(days=6))
+        self.assertEqual(sorted(index.gaps()), [3600, 5400, 7200])
+        with self.assertRaises(ValueError):
+            index.reserve(day, 3000, 4000)
+
+    def test_lazy_days_are_built_only_when_reached(self):
+        index, built = self.index({1: [(0, 1800)], 4: [(0, 7200)]}, day_capacity=lambda day: 7200)
+        self.assertEqual(built, [])
+        self.assertEqual(index.find(3600), (self.first_day + timedelta(days=4), 0, 3600))
+        self.assertEqual(built, [self.first_day + timedelta(days=offset) for offset in range(5)])
+        # Days found full are not searched or built again
+        self.assertEqual(index.find(3600)[0], self.first_day + timedelta(days=4))
+        self.assertEqual(len(built), 5)
+
+
+class TaskFromJobTests(TestCase):
+    def test_priority_of_an_edited_job(self):
+        job = Job.objects.create(title="Job", duration_hours=Decimal('1'))
+        job = Job.objects.get(id=job.id)
+        self.assertEqual(job.priority, 'C')
+        job.urgency = job.importance = 3
+        job.save()
+        self.assertEqual(Task.from_job(job).calculate_priority(), 'A')
+
+
+class PlanScheduleTests(SimpleTestCase):
+    now = datetime(2030, 1, 7, 6)  # A Monday, before working hours
+
+    def days(self, plan, key):
+        return [placement.start.date() for placement in plan.by_key().get(key, [])]
+
+    def test_subtract_intervals(self):
+        slots = [(0, 10), (20, 30), (40, 50)]
+        self.assertEqual(subtract_intervals(slots, []), slots)
+        self.assertEqual(subtract_intervals(slots, [(2, 4), (8, 22), (25, 26)]), [(0, 2), (4, 8), (22, 25), (26, 30), (40, 50)])
+        # One busy interval covering several slots
+        self.assertEqual(subtract_intervals(slots, [(5, 45)]), [(0, 5), (45, 50)])
+        self.assertEqual(subtract_intervals(slots, [(0, 50)]), [])
+
+    def test_one_frog_per_day(self):
+        tasks = [Task(key, "Frog", Decimal('1'), is_frog=True) for key in range(3)]
+        plan = plan_schedule(tasks, now=self.now, frog_days={date(2030, 1, 7)})
+        days = [self.days(plan, key)[0] for key in range(3)]
+        self.assertEqual(sorted(days), [date(2030, 1, 8), date(2030, 1, 9), date(2030, 1, 10)])
+
+    def test_chunks_go_on_different_days(self):
+        task = Task(1, "Report", Decimal('2.5'), can_be_divided=True, excluded_days=frozenset({date(2030, 1, 8)}))
+        plan = plan_schedule([task], now=self.now)
+        self.assertEqual(self.days(plan, 1), [date(2030, 1, 7), date(2030, 1, 9), date(2030, 1, 10)])
+        self.assertEqual([placement.duration_hours for placement in plan.placements], [1, 1, Decimal('0.5')])
+        self.assertEqual(plan.divided, {1})
+
+    def test_placed_around_busy_time(self):
+        busy = {}
+        add_busy(busy, date(2030, 1, 7), 7 * 3600, 11 * 3600)
+        plan = plan_schedule([Task(1, "Job", Decimal('2'))], busy=busy, now=self.now)
+        # Only an hour left before the lunch break
+        self.assertEqual(plan.placements[0].start, datetime(2030, 1, 7, 13))
+
+    def test_tight_due_date_goes_before_priority(self):
+        important = Task(1, "Important", Decimal('3'), urgency=3, importance=3)
+        due = Task(2, "Due today", Decimal('4'), due_date=date(2030, 1, 7))
+        plan = plan_schedule([important, due], now=self.now).by_key()
+        self.assertEqual(plan[2][0].start, datetime(2030, 1, 7, 7))
+        self.assertEqual(plan[1][0].start, datetime(2030, 1, 7, 13))
+
+    def test_due_dates_that_cannot_be_met(self):
+        impossible = Task(1, "Too long", Decimal('10'), due_date=date(2030, 1, 7))
+        chunked = Task(2, "Chunked", Decimal('3'), can_be_divided=True, due_date=date(2030, 1, 8))
+        late = Task(3, "Late", Decimal('2'), due_date=date(2030, 1, 4))
+        plan = plan_schedule([impossible, chunked, late], now=self.now)
+        self.assertEqual(self.days(plan, 1), [])
+        self.assertEqual(self.days(plan, 2), [date(2030, 1, 7), date(2030, 1, 8)])
+        # Past its due date, but still placed, first
+        self.assertEqual(plan.by_key()[3][0].start, datetime(2030, 1, 7, 7))
+        self.assertEqual(sorted(plan.missed_deadlines), [1, 2, 3])
+        self.assertEqual(plan.unplaced, [1])
+        self.assertEqual(plan.unplaced_hours, {1: Decimal('10'), 2: Decimal('1')})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCHEDULER_OPTIMIZE_SECONDS=0)
+class ConflictTests(TestCase):
+    day = date(2030, 1, 7)
+
+    def change(self, job, start, end):
+        return JobChange(job.id, job.version, job.title, JobChange.PLACED, None, [(self.day, start, end, job.duration_hours)])
+
+    def test_overlaps_and_second_frogs_conflict(self):
+        Job.objects.create(
+            title="Committed", date=self.day, start_time=time(9), end_time=time(10), duration_hours=Decimal('1'), is_frog=True,
+        )
+        overlapping = Job.objects.create(title="Overlapping", duration_hours=Decimal('1'))
+        frog = Job.objects.create(title="Frog", duration_hours=Decimal('1'), is_frog=True)
+        free = Job.objects.create(title="Free", duration_hours=Decimal('1'))
+        changes = [
+            self.change(overlapping, time(9, 30), time(10, 30)),
+            self.change(frog, time(13), time(14)),
+            self.change(free, time(10), time(11)),
+        ]
+        current = Job.objects.in_bulk([overlapping.id, frog.id, free.id])
+        self.assertEqual(find_conflicts(changes, current), {overlapping.id, frog.id})
+
+        # Nothing is written when the changes must go in together
+        self.assertEqual(apply_changes(changes, partial=False), {overlapping.id, frog.id})
+        self.assertFalse(Job.objects.filter(id=free.id, date__isnull=False).exists())
+        self.assertEqual(apply_changes(changes), {overlapping.id, frog.id})
+        free.refresh_from_db()
+        self.assertEqual((free.date, free.start_time), (self.day, time(10)))
+
+    def test_conflicting_job_is_planned_again(self):
+        job = Job.objects.create(title="Backlog job", duration_hours=Decimal('1'))
+
+        def plan_with_a_concurrent_writer(*args, **kwargs):
+            # Another scheduler takes the planned slot before this one commits
+            plan = plan_jobs(*args, **kwargs)
+            if planned.call_count == 1:
+                placement = plan.placements[0]
+                Job.objects.create(
+                    title="Concurrent", date=placement.start.date(), start_time=placement.start.time(),
+                    end_time=placement.end.time(), duration_hours=Decimal('1'),
+                )
+            return plan
+
+        with mock.patch('scheduler.scheduling.plan_jobs', side_effect=plan_with_a_concurrent_writer) as planned:
+            plan = schedule_jobs([job])
+        self.assertEqual(planned.call_count, 2)
+        self.assertEqual(plan.unplaced, [])
+        self.assertEqual(len(plan.placements), 1)
+        job.refresh_from_db()
+        concurrent = Job.objects.get(title="Concurrent")
+        self.assertIsNotNone(job.date)
+        self.assertNotEqual((job.date, job.start_time), (concurrent.date, concurrent.start_time))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCHEDULER_OPTIMIZE_SECONDS=0)
+class PreviewScheduleTests(TestCase):
+    def test_replan_of_a_scheduled_calendar_changes_nothing(self):
+        Job.objects.create(title="Frog", duration_hours=Decimal('2'), is_frog=True)
+        Job.objects.create(title="Report", duration_hours=Decimal('3'), can_be_divided=True)
+        Job.objects.create(title="Due", duration_hours=Decimal('1.5'), due_date=next_working_days(3)[-1], urgency=3)
+        preview = preview_schedule()
+        self.assertEqual(sorted(change.action for change in preview.changes), [JobChange.DIVIDED, JobChange.PLACED, JobChange.PLACED])
+
+        schedule_backlog()
+        preview = preview_schedule(replan=True)
+        self.assertEqual(preview.changes, [])
+        self.assertEqual(preview.unchanged, 3)
+
+        # A job moved by hand goes back to its slot, the rest stay unchanged
+        due = Job.objects.get(title="Due")
+        slot = due.date, due.start_time
+        Job.objects.filter(id=due.id).update(date=due.date + timedelta(days=1))
+        preview = preview_schedule(replan=True)
+        self.assertEqual([(change.job_id, change.action) for change in preview.changes], [(due.id, JobChange.MOVED)])
+        self.assertEqual(preview.changes[0].after[0][:2], slot)
+        self.assertEqual(preview.unchanged, 2)
+
+
+class OccurrenceDatesTests(TestCase):
+    def dates(self, first_day, last_day, **fields):
+        rule = RecurringJob(title="Rule", start_time=time(8), end_time=time(9), **fields)
+        return list(rule.occurrence_dates(first_day, last_day))
+
+    def test_daily_interval(self):
+        dates = self.dates(
+            date(2026, 10, 3), date(2026, 10, 31),
+            frequency=RecurringJob.DAILY, interval=3, starts_on=date(2026, 10, 1), ends_on=date(2026, 10, 16),
+        )
+        self.assertEqual(dates, [date(2026, 10, day) for day in [4, 7, 10, 13, 16]])
+        # Weekdays filter the days of the cycle
+        dates = self.dates(
+            date(2026, 10, 1), date(2026, 10, 14),
+            frequency=RecurringJob.DAILY, interval=2, weekdays='01234', starts_on=date(2026, 10, 1),
+        )
+        self.assertEqual(dates, [date(2026, 10, day) for day in [1, 5, 7, 9, 13]])
+
+    def test_weekly_interval_counts_weeks_from_the_start(self):
+        # Starts on a Thursday, every other week on Monday, Wednesday and Friday
+        dates = self.dates(
+            date(2026, 10, 10), date(2026, 11, 5),
+            frequency=RecurringJob.WEEKLY, interval=2, weekdays='024', starts_on=date(2026, 10, 1),
+        )
+        self.assertEqual(dates, [date(2026, 10, day) for day in [12, 14, 16, 26, 28, 30]])
+        # Before the start, nothing; the first week only from starts_on on
+        dates = self.dates(
+            date(2026, 9, 1), date(2026, 10, 9),
+            frequency=RecurringJob.WEEKLY, interval=2, weekdays='024', starts_on=date(2026, 10, 1),
+        )
+        self.assertEqual(dates, [date(2026, 10, 2)])
+
+    def test_weekly_without_weekdays_repeats_the_start_weekday(self):
+        dates = self.dates(
+            date(2026, 10, 1), date(2026, 11, 30),
+            frequency=RecurringJob.WEEKLY, interval=3, starts_on=date(2026, 10, 1), ends_on=date(2026, 11, 12),
+        )
+        self.assertEqual(dates, [date(2026, 10, 1), date(2026, 10, 22), date(2026, 11, 12)])
+
+    def test_far_future_range_starts_in_the_right_cycle(self):
+        dates = self.dates(
+            date(2126, 10, 1), date(2126, 10, 31),
+            frequency=RecurringJob.WEEKLY, interval=2, weekdays='0', starts_on=date(2026, 10, 5),
+        )
+        self.assertEqual(len(dates), 2)
+        self.assertEqual((dates[0] - date(2026, 10, 5)).days % 14, 0)
+        self.assertEqual(dates[1] - dates[0], timedelta(weeks=2))
+
+
+class TodayFeedTests(SimpleTestCase):
+    def test_stalled_client_keeps_only_the_latest_state(self):
+        today_feed = TodayFeed()
+        queue = asyncio.Queue(maxsize=1)
+        today_feed.subscribers.add(queue)
+        for state in [[{'key': 'job-1'}], None, [{'key': 'job-2'}], None]:
+            today_feed.publish(state)
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.get_nowait(), [{'key': 'job-2'}])
+        today_feed.publish(None)
+        self.assertIsNone(queue.get_nowait())
+
+    async def test_unread_stream_does_not_subscribe(self):
+        response = await today_events(AsyncRequestFactory().get(reverse('today_events')))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(feed.subscribers, set())
+        self.assertIsNone(feed.task)
@@ -3,16 +3,28 @@ from . import views
 
 urlpatterns = [
     path('', views.job_list, name='job_list'),  # job_list as the first page
+    path('export/', views.export_jobs, name='export_jobs'),
     path('weekly-view/', views.weekly_plan_view, name='weekly_plan_view'),  # for the weekly view
     path('today/', views.today_view, name='today'),
+    path('today/events/', views.today_events, name='today_events'),
     path('add-job/', views.add_job, name='add_job'),
     path('edit-job/<int:job_id>/', views.edit_job, name='edit_job'),
     path('delete-job/<int:job_id>/', views.delete_job, name='delete_job'),
     path('schedule-all/', views.schedule_all_jobs, name='schedule_all_jobs'),
+    path('schedule-runs/<int:run_id>/', views.schedule_run_status, name='schedule_run_status'),
+    path('plan-preview/', views.plan_preview, name='plan_preview'),
+    path('plan-preview/apply/', views.apply_plan, name='apply_plan'),
+    path('api/next-slot/', views.next_slot, name='next_slot'),
+    path('api/jobs/', views.api_jobs, name='api_jobs'),
+    path('api/weeks/<str:day>/', views.api_week, name='api_week'),
+    path('api/days/<str:day>/', views.api_day_jobs, name='api_day'),
     path('schedule-job/<int:job_id>/', views.schedule_single_job, name='schedule_single_job'),
     path('reset-job/<int:job_id>/', views.reset_job, name='reset_job'),
     path('reset-jobs/', views.reset_jobs, name='reset_jobs'),
     path('complete-job/<int:job_id>/', views.complete_job, name='complete_job'),
+    path('occurrence/<int:recurring_job_id>/<str:day>/edit/', views.edit_occurrence, name='edit_occurrence'),
+    path('occurrence/<int:recurring_job_id>/<str:day>/skip/', views.skip_occurrence, name='skip_occurrence'),
+    path('occurrence/<int:recurring_job_id>/<str:day>/complete/', views.complete_occurrence, name='complete_occurrence'),
     path('reset_jobs_confirm/', views.reset_jobs_confirm, name='reset_jobs_confirm'),
 
 
@@ -1,24 +1,138 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from .forms import JobForm
-from .models import Job
-from datetime import datetime, timedelta, time, date
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+from .cache import (
+    aweek_jobs, backlog_version, pop_plan_preview, recurrence_version, save_plan_preview, week_busy, week_version,
+)
+from .calendars import calendar_config
+from .engine import Task, add_busy, busy_intervals, find_free_slots, plan_schedule, seconds
+from .forms import JobForm, JobFilterForm, NextSlotForm
+from .live import feed, live_interval, today_rows, today_state
+from .models import Job, RecurringJob, ScheduleRun, default_calendar, overdue_status
+from .recurrence import aoccurrences
+from .runs import enqueue_schedule_run
+from .scheduling import JobChange, apply_changes, preview_schedule, schedule_jobs
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from itertools import chain
+import csv
+import json
+
+
+JOB_LIST_PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ['id', 'title', 'description', 'duration_hours', 'due_date', 'urgency', 'importance', 'priority', 'is_frog', 'can_be_divided']
+# Orderings of the unscheduled job list; each one is backed by a partial index
+JOB_LIST_ORDERINGS = {
+    'title': ['title', 'id'],
+    'priority': ['priority', 'title', 'id'],
+}
+# Type of each ordering field's values in an `after` cursor
+CURSOR_TYPES = {'title': str, 'priority': str, 'id': int}
+# Fields of jobs in the JSON API
+API_JOB_FIELDS = [
+    'id', 'recurring_job_id', 'title', 'description', 'date', 'start_time', 'end_time', 'duration_hours', 'due_date',
+    'urgency', 'importance', 'priority', 'is_frog', 'can_be_divided', 'completed', 'calendar_id',
+]
+
+def filtered_backlog(request):
+    # Unscheduled jobs (where both date and start_time are null), narrowed and
+    # ordered by the filter form
+    filter_form = JobFilterForm(request.GET)
+    jobs = Job.objects.backlog()
+    ordering = JOB_LIST_ORDERINGS['title']
+    if filter_form.is_valid():
+        jobs = filter_form.filter(jobs)
+        ordering = JOB_LIST_ORDERINGS[filter_form.cleaned_data['sort'] or 'title']
+    return filter_form, jobs.order_by(*ordering), ordering
+
+def parse_cursor(value, ordering):
+    # The `after` cursor is the JSON list of the ordering values of the last row shown
+    try:
+        cursor = json.loads(value)
+    except ValueError:
+        return None
+    if not isinstance(cursor, list) or len(cursor) != len(ordering):
+        return None
+    # Values of another type would make the ORM raise; treat them like any broken cursor
+    if any(type(value) is not CURSOR_TYPES[field] for value, field in zip(cursor, ordering)):
+        return None
+    return cursor
+
+async def backlog_page(request, jobs, ordering):
+    # Keyset pagination: each page starts after the last row of the previous one.
+    # Returns the page, the query string of the next one and the cursor used.
+    cursor = parse_cursor(request.GET.get('after', ''), ordering)
+    if cursor is not None:
+        jobs = jobs.keyset_after(ordering, cursor)
+
+    page = [job async for job in jobs[:JOB_LIST_PAGE_SIZE + 1]]
+    next_query = None
+    if len(page) > JOB_LIST_PAGE_SIZE:
+        page = page[:JOB_LIST_PAGE_SIZE]
+        query = request.GET.copy()
+        query['after'] = json.dumps([getattr(page[-1], field) for field in ordering])
+        next_query = query.urlencode()
+    return page, next_query, cursor
+
+# The read views (job list, weekly, today, run status and the JSON API) are
+# async, so under an ASGI server polling clients wait on the database without
+# holding a worker thread each; the write views stay sync.
+async def job_list(request):
+    # Validating the calendar choice queries the database, so the form runs sync
+    filter_form, jobs, ordering = await sync_to_async(filtered_backlog)(request)
+    page, next_query, cursor = await backlog_page(request, jobs, ordering)
+
+    filter_query = request.GET.copy()
+    filter_query.pop('after', None)
+    filter_query.pop('run', None)
+
+    # Status of a scheduling run started from this page
+    run_id = request.GET.get('run', '')
+    schedule_run = await ScheduleRun.objects.filter(id=run_id).afirst() if run_id.isdigit() else None
 
-
-# Constants for working hours and blocked times
-START_TIME = time(7, 0)          # 7:00 AM
-END_TIME = time(16, 0)           # 4:00 PM
-BLOCKED_TIME_START = time(12, 0) # 12:00 PM
-BLOCKED_TIME_END = time(13, 0)   # 1:00 PM
-MAX_DAYS = 30                    # Maximum number of days to look ahead for scheduling
-
-def job_list(request):
-    # Fetch only unscheduled jobs (where both date and start_time are null)
-    jobs = Job.objects.filter(date__isnull=True, start_time__isnull=True).order_by('title')
     context = {
-        'jobs': jobs,
+        'jobs': page,
+        'filter_form': filter_form,
+        'next_query': next_query,
+        'filter_query': filter_query.urlencode(),
+        'is_first_page': cursor is None,
+        'schedule_run': schedule_run,
     }
-    return render(request, 'scheduler/job_list.html', context)
+    # So does rendering it, which lists the calendars
+    return await sync_to_async(render)(request, 'scheduler/job_list.html', context)
+
+class Echo:
+    # Pseudo-buffer for csv.writer: returns each row instead of storing it
+    def write(self, value):
+        return value
+
+def export_jobs(request):
+    # Stream the (filtered) unscheduled backlog as CSV or JSON without loading it into memory
+    _, jobs, _ = filtered_backlog(request)
+    rows = jobs.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if request.GET.get('format') == 'json':
+        def json_rows():
+            yield '['
+            for i, row in enumerate(rows):
+                yield (',' if i else '') + json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder)
+            yield ']'
+
+        return StreamingHttpResponse(json_rows(), content_type='application/json')
+
+    writer = csv.writer(Echo())
+    csv_rows = chain([writer.writerow(EXPORT_FIELDS)], (writer.writerow(row) for row in rows))
+    response = StreamingHttpResponse(csv_rows, content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="unscheduled_jobs.csv"'
+    return response
 
 
 def get_week_dates(current_date):
@@ -27,13 +141,13 @@ def get_week_dates(current_date):
     return start_of_week, end_of_week
 
 # Weekly plan view (index.html shows one week)
-def weekly_plan_view(request):
+async def weekly_plan_view(request):
     week_offset = int(request.GET.get('week', 0))  # Get the week offset for navigating
     current_date = datetime.now().date()
     start_of_week, end_of_week = get_week_dates(current_date + timedelta(weeks=week_offset))
     
-    # Filter jobs for this week and order by date and start_time
-    jobs = Job.objects.filter(date__range=[start_of_week, end_of_week]).order_by('date', 'start_time')
+    # Jobs for this week ordered by date and start_time, cached until one of them changes
+    jobs = await aweek_jobs(start_of_week, end_of_week)
     
     context = {
         'jobs': jobs,
@@ -43,320 +157,237 @@ def weekly_plan_view(request):
     }
     return render(request, 'scheduler/index.html', context)
 
-def today_view(request):
-    current_time = datetime.now().time()  # Get the current time
-    today_jobs = Job.objects.filter(date=date.today()).order_by('start_time')
-
-    for job in today_jobs:
-        # If the job's end time has passed and it's not completed, mark it as unscheduled
-        if job.end_time and job.end_time < current_time and not job.completed:
-            job.start_time = None
-            job.end_time = None
-            job.date = None
-            job.save()
-
-        # Add attributes to determine if the job is overdue or close to overdue
-        if job.end_time and job.end_time < current_time and not job.completed:
-            job.is_overdue = True
-        elif job.end_time and (datetime.combine(date.today(), job.end_time) - datetime.now()).total_seconds() < 3600 and not job.completed:
-            job.is_close_to_overdue = True
-        else:
-            job.is_overdue = False
-            job.is_close_to_overdue = False
-
+async def today_view(request):
     if request.method == 'POST':
         job_id = request.POST.get('job_id')
-        job = Job.objects.get(id=job_id)
-        job.completed = True
-        job.save()
+        job = await Job.objects.aget(id=job_id)
+        await sync_to_async(job.complete)()
         return redirect('today')
 
+    # Read only: overdue jobs are sent back to the backlog by the sweep_overdue command
+    now = datetime.now()
+    today_jobs = [job async for job in Job.objects.filter(date=now.date()).with_overdue_flags(now).order_by('start_time')]
+
+    # Recurring job occurrences, flagged like with_overdue_flags does for jobs
+    async for occurrence in aoccurrences(now.date(), now.date()):
+        status = overdue_status(occurrence.completed, occurrence.end_time, now)
+        occurrence.is_overdue = status == 'overdue'
+        occurrence.is_close_to_overdue = status == 'close'
+        today_jobs.append(occurrence)
+    today_jobs.sort(key=lambda job: job.start_time or time.min)
+
     context = {
         'jobs': today_jobs,
-        'today': date.today(),
-        'current_time': current_time,
+        'today': now.date(),
+        'current_time': now.time(),
     }
     return render(request, 'scheduler/today.html', context)
 
-def is_time_available(day):
-    # Block weekends
-    if day.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-        return False
-    return True
-
-# Function to prioritize jobs by urgency and importance
-def prioritize_jobs(jobs):
-    # ABC Priority Method: A -> High Importance and Urgency, B -> Medium, C -> Low
-    a_jobs, b_jobs, c_jobs = [], [], []
-    
-    for job in jobs:
-        if job.calculate_priority() == 'A':
-            a_jobs.append(job)
-        elif job.calculate_priority() == 'B':
-            b_jobs.append(job)
-        else:
-            c_jobs.append(job)
-    
-    # Combine jobs by priority
-    return a_jobs + b_jobs + c_jobs
-
-def divide_task(job):
-    chunks = []
-    # Convert duration_hours to Decimal
-    duration_hours = Decimal(str(job.duration_hours))
-    # Check if job can be divided and duration is greater than 1 hour
-    if job.can_be_divided and duration_hours > Decimal('1'):
-        hours_remaining = duration_hours
-        # Loop until all hours are allocated
-        while hours_remaining > Decimal('0'):
-            # Allocate chunks of 1 hour or the remaining time if less than 1 hour
-            task_duration = min(Decimal('1'), hours_remaining)
-            chunks.append({
-                'title': job.title,
-                'urgency': job.urgency,
-                'importance': job.importance,
-                'duration': task_duration,  # This is a Decimal
-                'is_frog': job.is_frog,
-                'can_be_divided': job.can_be_divided
-            })
-            # Subtract allocated time from hours_remaining
-            hours_remaining -= task_duration
-        return chunks
-    else:
-        # If job cannot be divided, return it as a single task
-        return [{
-            'title': job.title,
-            'urgency': job.urgency,
-            'importance': job.importance,
-            'duration': Decimal(str(job.duration_hours)),
-            'is_frog': job.is_frog,
-            'can_be_divided': job.can_be_divided
-        }]
-    
-def get_available_time_slots(day, scheduled_intervals):
-    from datetime import datetime, timedelta
-
-    # Define the working day start and end datetime
-    day_start = datetime.combine(day, START_TIME)
-    day_end = datetime.combine(day, END_TIME)
-
-    # Start with the full working day as an available slot
-    available_slots = [(day_start, day_end)]
-
-    # Include blocked times (e.g., lunch break)
-    blocked_start = datetime.combine(day, BLOCKED_TIME_START)
-    blocked_end = datetime.combine(day, BLOCKED_TIME_END)
-
-    # Add blocked time to scheduled intervals
-    all_scheduled = scheduled_intervals + [(blocked_start, blocked_end)]
-
-    # Sort all scheduled intervals
-    all_scheduled.sort(key=lambda x: x[0])
-
-    # Subtract scheduled intervals from available slots
-    for scheduled_start, scheduled_end in all_scheduled:
-        temp_slots = []
-        for slot_start, slot_end in available_slots:
-            # No overlap
-            if scheduled_end <= slot_start or scheduled_start >= slot_end:
-                temp_slots.append((slot_start, slot_end))
-            else:
-                # Before scheduled interval
-                if scheduled_start > slot_start:
-                    temp_slots.append((slot_start, scheduled_start))
-                # After scheduled interval
-                if scheduled_end < slot_end:
-                    temp_slots.append((scheduled_end, slot_end))
-        available_slots = temp_slots
-
-    return available_slots
-
-# Main function to schedule jobs
-def schedule_jobs(jobs):
-    current_datetime = datetime.now()
-    current_day = current_datetime.date()
-
-    # Sort the jobs by priority (A -> B -> C)
-    prioritized_jobs = prioritize_jobs(jobs)
-
-    # Collect existing scheduled jobs (excluding the jobs we're about to schedule)
-    existing_jobs = Job.objects.filter(date__gte=current_day).exclude(id__in=[job.id for job in jobs])
-    scheduled_times = {}
-
-    for job in existing_jobs:
-        day = job.date
-        if day not in scheduled_times:
-            scheduled_times[day] = []
-        scheduled_times[day].append((datetime.combine(day, job.start_time), datetime.combine(day, job.end_time)))
-
-    # Store days where frogs have been scheduled
-    frog_scheduled_days = set()
-
-    # Track titles of jobs that are divided
-    divided_task_titles = {}
-
-    for job in prioritized_jobs:
-        # If the job is already scheduled, skip it
-        if job.start_time and job.date:
-            continue  # Skip this job, it's already manually scheduled
-
-        # First divide the job if necessary
-        divided_jobs = divide_task(job)
-
-        # If the job is not divided (single task), we can try to schedule it and update the original job
-        if len(divided_jobs) == 1:
-            task = divided_jobs[0]
-            scheduled = False
-            for day_offset in range(MAX_DAYS):
-                day = current_day + timedelta(days=day_offset)
-
-                # Skip if day is in the past
-                if day < current_day:
-                    continue
-
-                if is_time_available(day):
-                    # Check if a 'frog' task has already been scheduled for that day
-                    if task['is_frog'] and day in frog_scheduled_days:
-                        continue  # Skip day if a frog is already scheduled
-
-                    # Build a list of available time slots for the day
-                    available_slots = get_available_time_slots(day, scheduled_times.get(day, []))
-
-                    # Try to find a slot for the task
-                    for slot_start, slot_end in available_slots:
-                        # Adjust slot_start if it's before current time (avoid scheduling in the past)
-                        if day == current_day and slot_start < current_datetime:
-                            slot_start = current_datetime
-
-                        task_duration = timedelta(hours=float(task['duration']))
-                        potential_end = slot_start + task_duration
-
-                        # Check if the slot is big enough for the task
-                        if potential_end <= slot_end:
-                            # Schedule the task by updating the original job
-                            job.start_time = slot_start.time()
-                            job.date = slot_start.date()
-                            job.end_time = potential_end.time()
-                            job.save()
-
-                            # Update scheduled_times
-                            if day not in scheduled_times:
-                                scheduled_times[day] = []
-                            scheduled_times[day].append((slot_start, potential_end))
-
-                            # Sort the scheduled times for the day
-                            scheduled_times[day].sort(key=lambda x: x[0])
-
-                            scheduled = True
-
-                            # Mark the day as having a frog if the task is a frog
-                            if task['is_frog']:
-                                frog_scheduled_days.add(day)
-
-                            break  # Exit the slot loop
-
-                    if scheduled:
-                        break  # Exit the day loop
-
-            # If we couldn't schedule the job, it remains unscheduled
-
-        else:
-            # The job was divided into multiple chunks
-            scheduled_any_chunk = False
-            for task in divided_jobs:
-                scheduled = False
-                for day_offset in range(MAX_DAYS):
-                    day = current_day + timedelta(days=day_offset)
-
-                    # Skip if day is in the past
-                    if day < current_day:
-                        continue
-
-                    # Ensure tasks with the same title are not scheduled on the same day
-                    if task['title'] in divided_task_titles and day in divided_task_titles[task['title']]:
-                        continue
-
-                    if is_time_available(day):
-                        # Check if a 'frog' task has already been scheduled for that day
-                        if task['is_frog'] and day in frog_scheduled_days:
-                            continue  # Skip day if a frog is already scheduled
-
-                        # Build a list of available time slots for the day
-                        available_slots = get_available_time_slots(day, scheduled_times.get(day, []))
-
-                        # Try to find a slot for the task
-                        for slot_start, slot_end in available_slots:
-                            # Adjust slot_start if it's before current time (avoid scheduling in the past)
-                            if day == current_day and slot_start < current_datetime:
-                                slot_start = current_datetime
-
-                            task_duration = timedelta(hours=float(task['duration']))
-                            potential_end = slot_start + task_duration
-
-                            # Check if the slot is big enough for the task
-                            if potential_end <= slot_end:
-                                # Schedule the task by creating a new job instance
-                                job_instance = Job(
-                                    title=task['title'],
-                                    urgency=task['urgency'],
-                                    importance=task['importance'],
-                                    start_time=slot_start.time(),
-                                    date=slot_start.date(),
-                                    end_time=potential_end.time(),
-                                    duration_hours=task['duration'],
-                                    is_frog=task['is_frog'],
-                                    can_be_divided=task['can_be_divided']
-                                )
-                                job_instance.save()
-
-                                # Update scheduled_times
-                                if day not in scheduled_times:
-                                    scheduled_times[day] = []
-                                scheduled_times[day].append((slot_start, potential_end))
-
-                                # Sort the scheduled times for the day
-                                scheduled_times[day].sort(key=lambda x: x[0])
-
-                                scheduled = True
-                                scheduled_any_chunk = True
-
-                                # Mark the day as having a frog if the task is a frog
-                                if task['is_frog']:
-                                    frog_scheduled_days.add(day)
-
-                                # Track the task title and the day it was scheduled
-                                if task['title'] not in divided_task_titles:
-                                    divided_task_titles[task['title']] = set()
-                                divided_task_titles[task['title']].add(day)
-
-                                break  # Exit the slot loop
-
-                        if scheduled:
-                            break  # Exit the day loop
-
-            # After scheduling all chunks, delete the original job
-            if scheduled_any_chunk:
-                job.delete()
-            else:
-                # Could not schedule any chunk; job remains unscheduled
-                pass
+async def today_events(request):
+    # Server-sent events with the state of today's jobs each time it changes
+    # (see live.py); the today page recolours or reloads itself from them
+    retry = f'retry: {live_interval() * 1000}\n'
+    if not isinstance(request, ASGIRequest):
+        # A stream would hold a WSGI worker thread for as long as the page is
+        # open: send the current state and let the browser reconnect
+        now = datetime.now()
+        state = today_state(await today_rows(now.date()), now)
+        return HttpResponse(f'{retry}data: {json.dumps(state)}\n\n', content_type='text/event-stream')
+
+    async def events():
+        # Subscribed only once the stream is read, so a response that is never
+        # iterated leaves nothing behind
+        queue = None
+        try:
+            queue = feed.subscribe()
+            yield retry + '\n'
+            while True:
+                state = await queue.get()
+                yield ': keepalive\n\n' if state is None else f'data: {json.dumps(state)}\n\n'
+        finally:
+            feed.unsubscribe(queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Unbuffered behind nginx
+    return response
 
 # View function to schedule all unscheduled jobs
 def schedule_all_jobs(request):
     if request.method == 'POST':
-        # Fetch only unscheduled jobs
-        unscheduled_jobs = Job.objects.filter(date__isnull=True, start_time__isnull=True)
-        schedule_jobs(unscheduled_jobs)
-        return redirect('job_list')
+        # Queue the run and return right away; the background worker does the scheduling
+        run = enqueue_schedule_run()
+        if request.accepts('application/json') and not request.accepts('text/html'):
+            data = run.as_dict()
+            data['status_url'] = reverse('schedule_run_status', args=[run.id])
+            return JsonResponse(data, status=202)
+        return redirect(f"{reverse('job_list')}?run={run.id}")
     else:
         return redirect('job_list')
 
+async def schedule_run_status(request, run_id):
+    # Polled by the job list while a run is queued or running
+    try:
+        run = await ScheduleRun.objects.aget(id=run_id)
+    except ScheduleRun.DoesNotExist:
+        raise Http404("No such scheduling run.")
+    return JsonResponse(run.as_dict())
+
+def plan_preview(request):
+    # Dry run of scheduling (or of a full replan) shown as the changes it would make
+    replan = request.GET.get('replan') == '1'
+    preview = preview_schedule(replan)
+    changes = preview.by_action()
+    context = {
+        'token': save_plan_preview(preview),
+        'replan': replan,
+        'stale': request.GET.get('stale') == '1',
+        'unchanged': preview.unchanged,
+        'metrics': preview.metrics,
+        'has_changes': any(action != JobChange.UNPLACED for action in changes),
+        'placed': changes.get(JobChange.PLACED, []),
+        'moved': changes.get(JobChange.MOVED, []),
+        'divided': changes.get(JobChange.DIVIDED, []),
+        'unscheduled': changes.get(JobChange.UNSCHEDULED, []),
+        'unplaced': changes.get(JobChange.UNPLACED, []),
+    }
+    return render(request, 'scheduler/plan_preview.html', context)
+
+def apply_plan(request):
+    if request.method != 'POST':
+        return redirect('plan_preview')
+
+    # Write the previewed plan as a whole, or not at all if the calendar changed since
+    preview = pop_plan_preview(request.POST.get('token', ''))
+    if preview is None or apply_changes(preview.changes, partial=False):
+        query = '?replan=1&stale=1' if request.POST.get('replan') == '1' else '?stale=1'
+        return redirect(reverse('plan_preview') + query)
+    return redirect('weekly_plan_view')
+
+def next_slot(request):
+    # Earliest free slots for a job like the one described, answered from the
+    # cached week calendars without scheduling anything
+    form = NextSlotForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    data = form.cleaned_data
+
+    # The job being edited (and its chunks) does not block its own slot
+    excluded = {}
+    if data['exclude'] is not None:
+        own_slots = Job.objects.filter(Q(id=data['exclude']) | Q(parent_id=data['exclude']), date__isnull=False)
+        for day, start_time, end_time in own_slots.values_list('date', 'start_time', 'end_time'):
+            excluded.setdefault(day, set()).add((seconds(start_time), seconds(end_time)))
+
+    calendar_id = data['calendar'].id if data['calendar'] else default_calendar()
+    config = calendar_config(calendar_id)
+    weeks = {}
+
+    def load_day(day):
+        week = day - timedelta(days=day.weekday())
+        if week not in weeks:
+            weeks[week] = week_busy(day, calendar_id)
+        busy, frog_days = weeks[week]
+        day_busy = busy.get(day)
+        if day in excluded and day_busy:
+            kept = {}
+            for start, end in busy_intervals(day_busy):
+                if (start, end) not in excluded[day]:
+                    add_busy(kept, day, start, end)
+            day_busy = kept.get(day)
+        return day_busy, day in frog_days
+
+    if data['divide']:
+        # Where the chunks of a divisible job would go
+        task = Task(None, '', data['duration'], is_frog=data['frog'], can_be_divided=True, due_date=data['due'])
+        slots = [(placement.start, placement.end) for placement in plan_schedule([task], config=config, load_day=load_day).placements]
+    else:
+        slots = find_free_slots(
+            data['duration'], load_day, config=config, is_frog=data['frog'], due_date=data['due'],
+            count=data['count'] or 1,
+        )
+
+    return JsonResponse({
+        'divided': data['divide'],
+        'slots': [
+            {'start': start, 'end': end, 'label': f"{start:%a %Y-%m-%d %H:%M}-{end:%H:%M}"}
+            for start, end in slots
+        ],
+    })
+
+# Read-only JSON API for integrations and wall displays. Responses carry an
+# ETag made from the cache version tokens of what they show (see cache.py),
+# so conditional requests get a 304 from the tokens alone, before any query
+# runs. There is no Last-Modified: its whole seconds cannot tell apart two
+# writes in the same second, the tokens can.
+
+def job_data(job):
+    # A job or recurring job occurrence in the API; occurrences have no id
+    return {field: getattr(job, field, None) for field in API_JOB_FIELDS}
+
+def api_day(value):
+    # Date of an API URL, or None if it is not an ISO date
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+def backlog_etag(request):
+    return backlog_version()
+
+def week_etag(request, day):
+    # The week's (or day's) date is part of the tag, as the tokens are not per day
+    day = api_day(day)
+    if day is not None:
+        return f'{day}.{week_version(day)}.{recurrence_version()}'
+
+@require_safe
+@condition(etag_func=backlog_etag)
+async def api_jobs(request):
+    # The unscheduled backlog, filtered, sorted and paginated like the job list
+    _, jobs, ordering = await sync_to_async(filtered_backlog)(request)
+    page, next_query, _ = await backlog_page(request, jobs, ordering)
+    return JsonResponse({
+        'jobs': [job_data(job) for job in page],
+        'next': f"{reverse('api_jobs')}?{next_query}" if next_query else None,
+    })
+
+@require_safe
+@condition(etag_func=week_etag)
+async def api_week(request, day):
+    # Jobs and occurrences of the ISO week (Monday to Sunday) of `day`
+    day = api_day(day)
+    if day is None:
+        raise Http404("Not a date.")
+    start_of_week, end_of_week = get_week_dates(day)
+    jobs = await aweek_jobs(start_of_week, end_of_week)
+    return JsonResponse({
+        'start': start_of_week,
+        'end': end_of_week,
+        'jobs': [job_data(job) for job in jobs],
+    })
+
+@require_safe
+@condition(etag_func=week_etag)
+async def api_day_jobs(request, day):
+    # Jobs and occurrences of `day`, taken from its (cached) week. Whether
+    # they are overdue is left to the client, so the response only changes
+    # with the jobs and its ETag stays valid.
+    day = api_day(day)
+    if day is None:
+        raise Http404("Not a date.")
+    jobs = await aweek_jobs(*get_week_dates(day))
+    return JsonResponse({
+        'date': day,
+        'jobs': [job_data(job) for job in jobs if job.date == day],
+    })
+
 def schedule_single_job(request, job_id):
     job = get_object_or_404(Job, id=job_id)
 
     if request.method == 'POST':
-        # Schedule this single job using the existing scheduling logic
-        schedule_jobs([job])
+        # Schedule this single job, reading only the days it needs
+        schedule_jobs([job], incremental=True)
         return redirect('job_list')
     
     return redirect('job_list')
@@ -375,6 +406,8 @@ def add_job(request):
                 job.end_time = end_datetime.time()
 
             job.save()
+            if form.cleaned_data.get('unspecific_time') and getattr(settings, 'SCHEDULER_AUTO_PLACE', False):
+                schedule_jobs([job], incremental=True)
             return redirect('job_list')
     else:
         form = JobForm()
@@ -389,12 +422,26 @@ def edit_job(request, job_id):
             job = form.save(commit=False)
             duration_hours = form.cleaned_data.get('duration_hours', Decimal('0.25'))
 
+            if job.is_divided:
+                # The chunks repeat the old title and split the old duration:
+                # drop them, so the job is placed (and split) again as a whole
+                slot = job.date, job.start_time
+                job.reset()
+                job.date, job.start_time = slot
+
             if not form.cleaned_data.get('unspecific_time'):
                 start_datetime = datetime.combine(job.date, job.start_time)
                 end_datetime = start_datetime + timedelta(hours=float(duration_hours))
                 job.end_time = end_datetime.time()
+            elif getattr(settings, 'SCHEDULER_AUTO_PLACE', False):
+                # Let the scheduler find the job a new slot
+                job.start_time = None
+                job.end_time = None
+                job.date = None
 
             job.save()
+            if form.cleaned_data.get('unspecific_time') and getattr(settings, 'SCHEDULER_AUTO_PLACE', False):
+                schedule_jobs([job], incremental=True)
             return redirect('job_list')
     else:
         form = JobForm(instance=job)
@@ -412,18 +459,20 @@ def delete_job(request, job_id):
 def reset_job(request, job_id):
     job = get_object_or_404(Job, id=job_id)
     if request.method == 'POST':
-        job.start_time = None
-        job.end_time = None
-        job.date = None  # Reset the time and date
-        job.save()
+        job.reset()  # Reset the time and date; a split job goes back whole
         return redirect('job_list')
     else:
         return redirect('job_list')
 
 def reset_jobs(request):
     if request.method == 'POST':
-        # Perform the actual reset
-        Job.objects.all().update(start_time=None, end_time=None, date=None)
+        # Perform the actual reset: drop the chunks of split jobs and unschedule everything else
+        with transaction.atomic():
+            Job.objects.filter(parent__isnull=False).delete()
+            # Moved or completed occurrences of recurring jobs keep their slot, like the rest of their rule
+            Job.objects.filter(recurrence_exception__isnull=True).update(
+                start_time=None, end_time=None, date=None, is_divided=False,
+            )
         return redirect('job_list')
     else:
         # Show the confirmation page
@@ -436,12 +485,46 @@ def reset_jobs_confirm(request):
 
     return render(request, 'scheduler/reset_all.html')  # Renders the reset confirmation page
 
+def occurrence_of(recurring_job_id, day):
+    # The recurring job and the date of one of its occurrences, from the URL
+    recurring_job = get_object_or_404(RecurringJob, id=recurring_job_id)
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        raise Http404("Not a date.")
+    if next(recurring_job.occurrence_dates(day, day), None) is None:
+        raise Http404(f"{recurring_job} does not occur on {day}.")
+    return recurring_job, day
+
+def edit_occurrence(request, recurring_job_id, day):
+    # Store the occurrence as a job of its own and edit that, e.g. to move it
+    if request.method != 'POST':
+        return redirect('weekly_plan_view')
+    recurring_job, day = occurrence_of(recurring_job_id, day)
+    job = recurring_job.materialize(day)
+    if job is None:
+        return redirect('weekly_plan_view')  # Skipped meanwhile
+    return redirect('edit_job', job_id=job.id)
+
+def skip_occurrence(request, recurring_job_id, day):
+    if request.method == 'POST':
+        recurring_job, day = occurrence_of(recurring_job_id, day)
+        recurring_job.skip(day)
+    return redirect('today' if request.POST.get('next') == 'today' else 'weekly_plan_view')
+
+def complete_occurrence(request, recurring_job_id, day):
+    if request.method == 'POST':
+        recurring_job, day = occurrence_of(recurring_job_id, day)
+        job = recurring_job.materialize(day)
+        if job is not None:
+            job.complete()
+    return redirect('today')
+
 def complete_job(request, job_id):
     job = get_object_or_404(Job, id=job_id)
     if request.method == 'POST':
         # Mark the job as completed
-        job.completed = True
-        job.save()
+        job.complete()
         return redirect('today')
     return redirect('today')
 